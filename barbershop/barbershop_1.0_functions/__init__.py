@@ -11,29 +11,64 @@ parameter spaces, using a simple GUI.
 .. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
 """
 
+import os
+import importlib
 import numpy as np
-import matplotlib.pyplot as plt
-import matplotlib.mlab as mlab
-from matplotlib.widgets import Slider, Button
-import glob as glob
 import pandas as pd
 
-from .external_functions import *
+from .mask_functions import maskclass
+from .store_functions import storeclass
+from .save_functions import apply_selection, get_cuts, get_polygon, get_schema
+from .batch_functions import apply_cuts
+from .catalogue_functions import catalogueclass
+from .shared_functions import sharedclass, publish
+from .timing_functions import timingclass
+from .history_functions import cacheclass
+from .summary_functions import cubeclass, MINBINS
+from .cache_functions import diskcacheclass, pack_stats, unpack_stats
+
+#The GUI functions are only imported, along with matplotlib, when first asked for
+GUINAMES = ['barbicideclass', 'haircutclass', 'get_sample', 'get_density',\
+            'set_histograms', 'get_histcounts', 'get_histograms', 'quartet']
+
+def __getattr__(name):
+    if name in GUINAMES:
+        return getattr(importlib.import_module('.external_functions', __name__), name)
+    raise AttributeError('module '+__name__+' has no attribute '+name)
 
 class open:
-    def __init__(self, _core_df, _namex, _namey):
+    def __init__(self, _core_df, _namex, _namey, _dtype=None, _cache=None):
         '''
         A class that initialises the barbershop class which all other content is
         appended to.
 
         Parameters:
             _core_df (pandas.core.frame.DataFrame): A dataframe containing all
-                        data the user wishes to call in this module.
+                        data the user wishes to call in this module. For data
+                        that does not fit in memory, this may instead be the
+                        location of a catalogue on disk (or a catalogueclass),
+                        of which only X, Y and the clients are read in, or a
+                        sharedclass attached to a catalogue published into
+                        shared memory with publish().
             _namex (str): The name of the X values in _core_df
             _namey (str): The name of the Y values in _core_df
+            _dtype (numpy.dtype): Default None. If given (e.g. np.float32), the
+                        data used for the cuts is held in this dtype. Otherwise
+                        the columns of _core_df are used without a copy.
+            _cache (str): Default None. If given, a directory in which sorted
+                        indices, statistics, histograms and masks are kept for
+                        later sessions on the same data (see cache_mode()).
         '''
+        #Open catalogues on disk, reading in columns only when needed
+        if isinstance(_core_df, str):
+            try:
+                _core_df = catalogueclass(_core_df)
+            except IOError:
+                print('This catalogue does not exist. Please fill in a correct file path.')
+                return None
+
         #Check contents is a dataframe
-        if not isinstance(_core_df, pd.core.frame.DataFrame):
+        if not isinstance(_core_df, (pd.core.frame.DataFrame, catalogueclass, sharedclass)):
             print('Please enter in a pandas DataFrame containing the data.')
             self.close_shop()
             return None
@@ -50,11 +85,38 @@ class open:
 
         #Initializing other metadata
         self.clients = 0
-        self.seating = pd.DataFrame({self.namex: self.X, self.namey : self.Y})
+        self.seating = storeclass(self.core_df.index, _dtype)
+        self.seating[self.namex] = self.X
+        self.seating[self.namey] = self.Y
+        self.disk = None
+        if _cache is not None:
+            self.cache_mode(_cache)
+        self.get_stats(self.namex)
+        self.get_stats(self.namey)
         self.lowers = pd.DataFrame()
         self.uppers = pd.DataFrame()
+        self.polygon = None
         self.floc = 'dataframe_cut.csv'
         self.cloc = 'cuts.csv'
+        self.sloc = 'selection.npz'
+        self.saveout = 'dataframe'
+        self.chunksize = 1000000
+        self.mask = maskclass(self)
+        self.mask.cache = cacheclass(64*2**20)
+        self.depth = 100
+        self.summary = False
+        self.maxcells = 2**22
+        self.cube = None
+        self.timing = timingclass()
+        self.overlay = False
+        self.render = 'auto'
+        self.maxpoints = 200000
+        self.densitybins = 300
+        self.slidermode = 'drag'
+        self.interval = 40
+        self.background = False
+        self.layout = 'figures'
+        self.cmaps = ['viridis','winter','plasma','GnBu','cool']
 
         #Check X and Y are of equal length
         if len(self.X) != len(self.Y):
@@ -76,10 +138,218 @@ class open:
         self.hist_x_on = x
         self.hist_y_on = y
 
-    def add_client(self, name, lower=-np.inf, upper=np.inf):
+    def instrument(self, on=True, overlay=False):
+        '''Turn on timing of the hot paths: shave(), the slider updates, the
+        histograms, the save and get_regular(). The results are returned by
+        get_timings().
+        Parameters:
+            on (bool): Default True. Set False to stop timing.
+            overlay (bool): Default False. Set True to show the time taken by
+                every stage of the latest update below the sliders.
+        '''
+        self.timing.enabled = on
+        self.overlay = on and overlay
+
+    def get_timings(self):
+        '''
+        Returns the timings recorded since instrument() was called.
+
+        Returns:
+            pandas.core.frame.DataFrame: For every stage of every function,
+                the number of calls and the mean, median and maximum time in
+                milliseconds, along with the mean rows in and out and bytes
+                produced per call.
+        '''
+        return self.timing.summary()
+
+    def layout_mode(self, mode='figures'):
+        '''Choose how the client plots are laid out. The cut positions are
+        computed once per update and shared by all plots in every mode.
+        Parameters:
+            mode (str): Default 'figures'. In 'figures' mode every client gets
+                a figure of its own. In 'subplots' mode all clients are drawn
+                as subplots of a single figure, which is redrawn once per
+                update. In 'selector' mode a single scatter is drawn, with
+                buttons to choose the client it is coloured by.
+        '''
+        if mode not in ['figures', 'subplots', 'selector']:
+            print('Please choose a layout from figures, subplots or selector.')
+            return None
+        self.layout = mode
+
+    def use_threads(self, threads=None, blocksize=262144):
+        '''Choose how many threads are used to evaluate the cuts.
+        Parameters:
+            threads (int): Default None. The number of threads. If None, one
+                per CPU is used. Set to 1 to evaluate the cuts in serial.
+            blocksize (int): Default 262144. The number of rows evaluated by a
+                thread at a time. Tables no bigger than this are always cut in
+                serial.
+        '''
+        self.mask.threads = threads if threads is not None else (os.cpu_count() or 1)
+        self.mask.blocksize = blocksize
+        #The old pool is rebuilt with the new number of threads when next needed
+        if self.mask.pool is not None:
+            self.mask.pool.shutdown(wait=False)
+        self.mask.pool = None
+
+    def slider_mode(self, mode='drag', interval=40, background=False):
+        '''Choose when the plots are updated as the sliders are moved.
+        Parameters:
+            mode (str): Default 'drag'. In 'drag' mode the plots follow the
+                sliders while they are dragged. In 'release' mode they are only
+                updated once the mouse button is released.
+            interval (int): Default 40. In 'drag' mode, the shortest time in
+                milliseconds between two updates. All slider events within
+                this time are combined into a single update. Set to 0 to
+                update on every event.
+            background (bool): Default False. If True, the cuts are computed
+                on a background thread so that the windows stay responsive,
+                and cuts overtaken by newer slider values are abandoned.
+        '''
+        if mode not in ['drag', 'release']:
+            print('Please choose a slider mode from drag or release.')
+            return None
+        self.slidermode = mode
+        self.interval = interval
+        self.background = background
+
+    def history_mode(self, depth=100, cachesize=64):
+        '''Choose how many earlier cuts can be returned to with the Undo and
+        Redo buttons (or ctrl+z and ctrl+y), and how much memory is spent on
+        making that instant.
+        Parameters:
+            depth (int): Default 100. The most cuts remembered.
+            cachesize (float): Default 64. The memory in MB kept for the masks
+                of earlier cuts, packed to one bit per row. Cuts whose masks
+                are no longer kept are recomputed. Set to 0 to keep none.
+        '''
+        self.depth = depth
+        self.mask.cache = cacheclass(int(cachesize*2**20)) if cachesize > 0 else None
+
+    def cache_mode(self, floc='barbershop_cache', maxsize=1024):
+        '''Choose a directory in which the sorted indices and statistics of
+        every client, the histogram baselines and the masks of the cuts are
+        kept. Later sessions on the same data read them back in as memory maps
+        instead of recomputing them. Catalogues on disk are recognised by the
+        size and modification time of their files, and all other data by a
+        hash of its values.
+        Parameters:
+            floc (str): Default 'barbershop_cache'. The cache directory. Set
+                to None to stop using it.
+            maxsize (float): Default 1024. The size limit of the directory in
+                MB, beyond which the least recently used entries are deleted.
+        '''
+        self.disk = diskcacheclass(floc, int(maxsize*2**20)) if floc is not None else None
+
+    def get_stats(self, name, svalues=None):
+        '''
+        Returns the statistics of a column of the store (see
+        storeclass.describe()), reading them from the cache directory if they
+        are kept there.
+
+        Parameters:
+            name (str): The name of the column.
+            svalues (ndarray): Default None. The sorted non-NaN values of the
+                column, if already known.
+        '''
+        if self.disk is None or name in self.seating.stats:
+            return self.seating.describe(name, svalues)
+        fingerprint = self.disk.fingerprint(self, name)
+        cached = self.disk.get('stats', fingerprint)
+        if cached is not None:
+            self.seating.stats[name] = unpack_stats(cached)
+            return self.seating.stats[name]
+        stats = self.seating.describe(name, svalues)
+        self.disk.put(pack_stats(stats), 'stats', fingerprint)
+        return stats
+
+    def summary_mode(self, on=True, maxcells=2**22):
+        '''Turn on the binned summary of the data, from which the number of
+        rows surviving the cuts is estimated as the sliders are dragged,
+        without evaluating them. It is built in show_mirror(), and shown with
+        the number of rows kept by each client's cut alone above the sliders.
+        Combined with slider_mode('release'), the exact cuts are only
+        evaluated once a slider is let go.
+        Parameters:
+            on (bool): Default True. Set False to turn the summary off.
+            maxcells (int): Default 2**22. The largest number of cells in the
+                summary, shared between the bins of X, Y and every client.
+                Each cell takes 8 bytes. Axes that do not fit with at least
+                MINBINS bins each are summarised on their own.
+        '''
+        if maxcells < MINBINS+1:
+            print('The summary needs at least '+str(MINBINS+1)+' cells.')
+            return None
+        self.summary = on
+        self.maxcells = maxcells
+        self.cube = None
+
+    def estimate(self, lower=None, upper=None):
+        '''
+        Estimates the number of rows surviving a set of cuts from the binned
+        summary of the data (see summary_mode()), building it if needed.
+
+        Parameters:
+            lower (pandas.core.frame.DataFrame): Default None. The lower
+                boundary of the cut in each parameter space. If None, the
+                current cuts are used.
+            upper (pandas.core.frame.DataFrame): Default None. The upper
+                boundary of the cut in each parameter space.
+
+        Returns:
+            int: The estimated number of surviving rows.
+        '''
+        if self.cube is None:
+            with self.timing.stage('summary', 'build'):
+                self.cube = cubeclass(self, self.maxcells)
+        if lower is None:
+            lower, upper = self.lowers, self.uppers
+        return self.cube.count(lower, upper)
+
+    def undo(self):
+        '''
+        Returns the sliders of the mirror to the previous cut in its history.
+        '''
+        if not hasattr(self, 'haircut'):
+            print('Please open the mirror with show_mirror() first.')
+            return None
+        self.haircut.undo(None)
+
+    def redo(self):
+        '''
+        Returns the sliders of the mirror to the next cut in its history.
+        '''
+        if not hasattr(self, 'haircut'):
+            print('Please open the mirror with show_mirror() first.')
+            return None
+        self.haircut.redo(None)
+
+    def render_mode(self, mode='auto', maxpoints=200000, densitybins=300):
+        '''Choose how the data are drawn in the client figures. Cuts and saves
+        always act on the full data, whichever mode is chosen.
+        Parameters:
+            mode (str): Default 'auto'. One of 'scatter' (every surviving
+                row), 'sample' (a fixed random subset of at most 'maxpoints'
+                rows), 'density' (an image of the mean client value in bins
+                of X and Y), or 'auto', which draws a scatter of every row up
+                to 'maxpoints' rows and a sample above that.
+            maxpoints (int): Default 200000. The most points drawn per figure
+                in 'sample' mode, and the size at which 'auto' switches.
+            densitybins (int): Default 300. Number of bins along X and Y used
+                in 'density' mode.
+        '''
+        if mode not in ['auto', 'scatter', 'sample', 'density']:
+            print('Please choose a render mode from auto, scatter, sample or density.')
+            return None
+        self.render = mode
+        self.maxpoints = maxpoints
+        self.densitybins = densitybins
+
+    def add_client(self, name, lower=-np.inf, upper=np.inf, sort=True):
         '''
-        A function that allows the user to add a parameter to make cuts in, up to
-        a maximum of five. The user has the option of setting lower and upper
+        A function that allows the user to add a parameter to make cuts in. Any
+        number of parameters may be added. The user has the option of setting lower and upper
         limits on the cuts in this parameter space. If values are given for either
         'lower', 'upper', or 'both', these are used to make initial cuts to the
         data.
@@ -99,6 +369,11 @@ class open:
             upper (float): Default Inf. The highest possible value of the cut
                 in this parameter space. If no value is given, it takes the
                 highest value in the 'client' ndarray.
+
+            sort (bool): Default True. If True, a sorted index of the client is
+                built once so that cuts are found with a binary search, and
+                moving a slider only touches the rows between its old and new
+                positions.
         '''
         #Call the data from the core dataframe
         try:
@@ -107,47 +382,45 @@ class open:
             print('The handle "'+str(name)+'" is not affiliated with a dataframe column.')
             print('Please enter a correct handle, or re-open the barbershop with a different dataframe.')
             print('Client leaving the barbershop.')
-            print('Number of seats in use : '+str(self.clients)+'/5.')
-            return None
-
-        #Check that the list of clients isn't already full
-        if self.clients == 5:
-            print('The barbershop is full, please proceed to plot the GUI, or remove clients using the evict_client(name) command.')
+            print('Number of seats in use : '+str(self.clients)+'.')
             return None
 
         #Check length of the client is in agreement with X and Y
         if len(client) != len(self.X):
             print('Client is not of equal length with X and Y.')
             print('Client leaving the barbershop.')
-            print('Number of seats in use : '+str(self.clients)+'/5.')
+            print('Number of seats in use : '+str(self.clients)+'.')
             return None
 
         #Check that name is a string
         if type(name) != str:
             print('Please enter "name" as a string.')
             print('Client leaving the barbershop.')
-            print('Number of seats in use : '+str(self.clients)+'/5.')
+            print('Number of seats in use : '+str(self.clients)+'.')
             return None
 
-        #Adding the data to the existing class dataframe 'self.seating'
+        #Adding the data to the existing class store 'self.seating'
         self.seating[name] = client
+        self.mask.forget(name)
+        self.cube = None
+        if self.disk is not None:
+            self.disk.forget(name)
+        if sort:
+            self.mask.index(name)
+        stats = self.get_stats(name, self.mask.sorted.get(name))
 
         #Save the lower and upper values
         if not np.isfinite(lower):
-            self.lowers[name] = [np.nanmin(client)]
+            self.lowers[name] = [stats['min']]
         else:
             self.lowers[name] = [lower]
         if not np.isfinite(upper):
-            self.uppers[name] = [np.nanmax(client)]
+            self.uppers[name] = [stats['max']]
         else:
             self.uppers[name] = [upper]
 
         self.clients += 1
-        print('Number of seats in use : '+str(self.clients)+'/5.')
-
-        if self.clients == 5:
-            print('The barbershop is now full (5 parameter spaces)')
-            print('Please evict a client if you wish to add another.')
+        print('Number of seats in use : '+str(self.clients)+'.')
 
     def evict_client(self, name):
         '''
@@ -174,9 +447,11 @@ class open:
         del self.seating[name]
         del self.lowers[name]
         del self.uppers[name]
+        self.mask.forget(name)
+        self.cube = None
         self.clients -= 1
         print('Client '+str(name)+' has been evicted.')
-        print('Number of seats in use : '+str(self.clients)+'/5.')
+        print('Number of seats in use : '+str(self.clients)+'.')
 
     def close_shop(self):
         '''
@@ -191,6 +466,10 @@ class open:
         del self.seating
         del self.lowers
         del self.uppers
+        del self.mask
+        del self.render
+        del self.maxpoints
+        del self.densitybins
         del self.namex
         del self.namey
 
@@ -206,44 +485,55 @@ class open:
         NOTE: This class overwrites all loaded clients.
 
         Parameters:
-            sfile (str): The location of the .csv file containing the cuts to be
-            applied to the self.core_df dataframe.
+            sfile (str): The location of the .csv or .json file containing the
+            cuts to be applied to the self.core_df dataframe.
         '''
         try:
-            reg = pd.DataFrame.from_csv(sfile,sep=' ')
+            with self.timing.stage('get_regular', 'read'):
+                lowers, uppers, schema = get_cuts(sfile)
         except IOError:
             print('This file does not exist. Please fill in a correct file path.')
             return None
-        try:
-            l = reg.loc['lower']
-            u = reg.loc['upper']
-            self.lowers = pd.DataFrame()
-            self.uppers = pd.DataFrame()
-            for client in l.index:
-                self.lowers[client] = [l[client]]
-                self.uppers[client] = [u[client]]
-
-        except KeyError:
+        except (KeyError, ValueError):
             print('Please make sure you fill in a path to the correct file.')
             return None
 
         #Check all the regular names are in the loaded core_df
-        for client in list(self.lowers):
-            if all(word != client for word in list(self.core_df)):
-                print('The label '+client+' is not in the loaded dataframe.')
-                print('Please either make new cuts or reload barbershop after updating the labels in your dataframe.')
-                return None
-
+        with self.timing.stage('get_regular', 'validate'):
+            missing = set(list(lowers)) - set(list(self.core_df))
+        if len(missing) > 0:
+            print('The labels '+', '.join(sorted(missing))+' are not in the loaded dataframe.')
+            print('Please either make new cuts or reload barbershop after updating the labels in your dataframe.')
+            return None
+        if (schema is not None) and (schema != get_schema(self.core_df, list(lowers))):
+            print('Warning: the data types of these columns differ from those the cuts were made on.')
+        polygon = get_polygon(sfile)
+        if (polygon is not None) and ([polygon['x'], polygon['y']] != [self.namex, self.namey]):
+            print('The polygon cut was made in '+polygon['x']+' and '+polygon['y']+', and has been left out.')
+            polygon = None
+        self.polygon = None if polygon is None else polygon['vertices']
+
+        self.lowers = lowers
+        self.uppers = uppers
         print('All read-in labels correspond to columns in the loaded dataframe.')
         if self.clients > 0:
             print('Overwriting current clients...')
-            self.seating = pd.DataFrame({self.namex: self.X, self.namey : self.Y})
+            for client in list(self.seating):
+                if client not in [self.namex, self.namey]:
+                    del self.seating[client]
             self.clients = 0
-
-        for client in list(self.lowers):
-            self.seating[client] = self.core_df[client]
-            self.clients += 1
-            print('Number of seats in use : '+str(self.clients)+'/5.')
+        self.mask.forget()
+        self.cube = None
+
+        with self.timing.stage('get_regular', 'load'):
+            for client in list(self.lowers):
+                self.seating[client] = self.core_df[client]
+                if self.disk is not None:
+                    self.disk.forget(client)
+                self.mask.index(client)
+                self.get_stats(client, self.mask.sorted.get(client))
+                self.clients += 1
+                print('Number of seats in use : '+str(self.clients)+'.')
 
         self.show_mirror()
 
@@ -254,49 +544,100 @@ class open:
             -For each client: a plot of X vs Y coloured according to the client
                 data with corresponding colourbar.
             -A plot of X vs Y
+            -(Optional): For large tables, a random sample of the data or a
+                binned density image instead of every point (see render_mode).
             -(Optional): A histogram in X and/or Y
-            -A plot containing up to 10 sliders (two for each client), buttons to
+            -A plot containing two sliders for each client, buttons to
                 reset the cuts on each slider, to save out the data, and to close
                 all plots.
         '''
+        #The plotting machinery is only loaded once the mirror is first shown
+        import matplotlib.pyplot as plt
+        from matplotlib.widgets import Slider, Button, RadioButtons, LassoSelector
+        from .external_functions import barbicideclass, haircutclass,\
+                                        set_histograms, get_sample, get_density
+
         #Make initial cuts
         dff = self.shave(self.lowers, self.uppers)
+        #Bin the data for estimating cuts while the sliders are dragged
+        if self.summary and self.cube is None:
+            self.estimate()
 
         '''
         INITIATING HISTOGRAMS
         '''
         #Initialise initial histograms axes if requested
         if any([self.hist_x_on, self.hist_y_on]):
-            self.bins = int(np.sqrt(len(dff)))      #Save out number of bins for histograms
+            self.bins = max(int(np.sqrt(len(dff))), 1)      #Save out number of bins for histograms
             if not all([self.hist_x_on, self.hist_y_on]):
                 self.Hfig, self.Hax = plt.subplots()              #Create the figure
             else:
                 #If both histograms are turned on
                 self.Hfig, self.Hax = plt.subplots(2)         #Create the figure
 
-            #Populated histograms
-            get_histograms(self, dff)
+            #Populate histograms, computing the initial cut baseline once
+            set_histograms(self, dff)
 
 
         '''
         INITIATING PLOTS
         '''
+        xstats = self.seating.describe(self.namex)
+        ystats = self.seating.describe(self.namey)
+
+        #Choose how to draw the data, based on the size of the table
+        self.drawmode = self.render
+        if self.drawmode == 'auto':
+            if len(self.seating) <= self.maxpoints:
+                self.drawmode = 'scatter'
+            else:
+                self.drawmode = 'sample'
+        if self.drawmode == 'sample':
+            #Draw the same random subset of rows throughout the session
+            self.sample = np.sort(np.random.default_rng().choice(len(self.seating),\
+                        min(self.maxpoints, len(self.seating)), replace=False))
+        if self.drawmode == 'density':
+            self.xedges = np.linspace(xstats['min'], xstats['max'], self.densitybins+1)
+            self.yedges = np.linspace(ystats['min'], ystats['max'], self.densitybins+1)
+
         #Initialise all display parameter plots
-        cmaps = ['viridis','winter','plasma','GnBu','cool']
         self.figs, self.axes = self.get_shells()
+        #Each panel is a figure, its axes, and the client it is coloured by
+        if self.layout == 'selector':
+            self.panels = [[self.figs[0], self.axes[0], list(self.lowers)[0]]]
+        else:
+            self.panels = [[fig, ax, client] for fig, ax, client\
+                            in zip(self.figs, self.axes, list(self.lowers))]
+        if self.drawmode == 'density':
+            images = get_density(self, dff, [panel[2] for panel in self.panels])
+        else:
+            dpl = get_sample(self, dff)
+
         #Create first build of plots
-        for idx, client in enumerate(list(self.lowers)):
-            ctemp = self.axes[idx].scatter(dff[self.namex],dff[self.namey],\
-                        cmap = cmaps[idx], c=dff[client], s=20)
-            self.figs[idx].colorbar(ctemp, label=client)
-            self.axes[idx].grid()
-            self.axes[idx].set_axisbelow(True)
-            self.axes[idx].set_xlabel(self.namex)
-            self.axes[idx].set_ylabel(self.namey)
-            self.axes[idx].set_xlim(np.nanmin(self.seating[self.namex]),\
-                                    np.nanmax(self.seating[self.namex]))
-            self.axes[idx].set_ylim(np.nanmin(self.seating[self.namey]),\
-                                    np.nanmax(self.seating[self.namey]))
+        self.cbars = []
+        for idx, (fig, ax, client) in enumerate(self.panels):
+            cmap = self.cmaps[list(self.lowers).index(client) % len(self.cmaps)]
+            if self.drawmode == 'density':
+                ctemp = ax.imshow(images[idx], origin='lower',\
+                        aspect='auto', interpolation='nearest', cmap = cmap,\
+                        extent=[self.xedges[0], self.xedges[-1],\
+                                self.yedges[0], self.yedges[-1]])
+            else:
+                ctemp = ax.scatter(dpl[self.namex],dpl[self.namey],\
+                        cmap = cmap, c=dpl[client], s=20)
+            self.cbars.append(fig.colorbar(ctemp, ax=ax, label=client))
+            ax.grid()
+            ax.set_axisbelow(True)
+            ax.set_xlabel(self.namex)
+            ax.set_ylabel(self.namey)
+            ax.set_xlim(xstats['min'], xstats['max'])
+            ax.set_ylim(ystats['min'], ystats['max'])
+
+        #Outline of the polygon cut, drawn with the lasso on any client axis
+        self.outlines, self.lassos = [], []
+        for ax in list({id(ax): ax for fig, ax, client in self.panels}.values()):
+            self.outlines.append(ax.plot([], [], color='r', lw=1.5)[0])
+            self.lassos.append(LassoSelector(ax, lambda verts: self.haircut.lasso(verts)))
 
         '''
         INITIATING SLIDERS
@@ -305,147 +646,57 @@ class open:
         barbicide = barbicideclass(self)
         #Initialise haircut class for slider functions
         haircut = haircutclass(self)
+        self.haircut = haircut
+        haircut.set_polygon(self.polygon)
         axcolor = 'white'   #Defining button colours
 
-        Sfig, Sax = plt.subplots(2*self.clients, figsize=(6,self.clients))
-        #Adjusting the figure for buttons
-        Sfig.subplots_adjust(bottom=(1./(2*self.clients+0.8)), right=0.70)
-
-        #Note: This section can not be iterative, and is hardcoded
+        self.Sfig, Sax = plt.subplots(2*self.clients, figsize=(6,self.clients))
+        #Adjusting the figure for two rows of buttons
+        self.Sfig.subplots_adjust(bottom=(2./(2*self.clients+1.8)), right=0.70)
+        #Room for the timing overlay, which instrument() may turn on at any time
+        self.overlaytext = self.Sfig.text(0.01, 0.005, '', fontsize=7)
+        #Room for the number of rows surviving, which summary_mode() may turn on at any time
+        self.counttext = self.Sfig.text(0.01, 0.96, '', fontsize=7, va='top')
+        #Catch the end of a drag for the 'release' slider mode and the history
+        self.Sfig.canvas.mpl_connect('button_release_event', haircut.release)
+        #Keyboard shortcuts for stepping through the history of cuts
+        for fig in [self.Sfig] + list({id(fig): fig for fig in self.figs}.values()):
+            fig.canvas.mpl_connect('key_press_event', haircut.keypress)
+
+        #Registry of the sliders and reset buttons of every client
+        self.mins, self.maxs = {}, {}
+        self.minres, self.maxres = {}, {}
         for idx, client in enumerate(list(self.lowers)):
-            if (self.clients >= 1) & (idx == 0):
-                #Minimum value in parameter space 'client'
-                self.a1min = Slider(Sax[int(2*idx)], 'Min '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.lowers[client][0])
-                #Maximum value in parameter space 'client'
-                self.a1max = Slider(Sax[int(2*idx)+1], 'Max '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.uppers[client][0])
-                #Reset button for minimum slider
-                l = Sax[int(2*idx)].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a1minres = Button(tax, 'Reset '+client+' Min', color=axcolor, hovercolor='0.7')
-                #Reset button for maximum slider
-                l = Sax[int(2*idx)+1].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a1maxres = Button(tax, 'Reset '+client+' Max', color=axcolor, hovercolor='0.7')
-
-                #Update commands for the widgets
-                self.a1min.on_changed(haircut.update)
-                self.a1max.on_changed(haircut.update)
-                self.a1minres.on_clicked(barbicide.a1min)
-                self.a1maxres.on_clicked(barbicide.a1max)
-
-            if (self.clients >= 2) & (idx == 1):
-                #Minimum value in parameter space 'client'
-                self.a2min = Slider(Sax[int(2*idx)], 'Min '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.lowers[client][0])
-                #Maximum value in parameter space 'client'
-                self.a2max = Slider(Sax[int(2*idx)+1], 'Max '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.uppers[client][0])
-
-                #Reset button for minimum slider
-                l = Sax[int(2*idx)].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a2minres = Button(tax, 'Reset '+client+' Min', color=axcolor, hovercolor='0.7')
-                #Reset button for maximum slider
-                l = Sax[int(2*idx)+1].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a2maxres = Button(tax, 'Reset '+client+' Max', color=axcolor, hovercolor='0.7')
-
-                #Update commands for the widgets
-                self.a2min.on_changed(haircut.update)
-                self.a2max.on_changed(haircut.update)
-                self.a2minres.on_clicked(barbicide.a2min)
-                self.a2maxres.on_clicked(barbicide.a2max)
-
-            if (self.clients >= 3) & (idx == 2):
-                #Maximum value in parameter space 'client'
-                self.a3min = Slider(Sax[int(2*idx)], 'Min '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.lowers[client][0])
-                #Minimum value in parameter space 'client'
-                self.a3max = Slider(Sax[int(2*idx)+1], 'Max '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.uppers[client][0])
-
-                #Reset button for minimum slider
-                l = Sax[int(2*idx)].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a3minres = Button(tax, 'Reset '+client+' Min', color=axcolor, hovercolor='0.7')
-                #Reset button for maximum slider
-                l = Sax[int(2*idx)+1].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a3maxres = Button(tax, 'Reset '+client+' Max', color=axcolor, hovercolor='0.7')
-
-                #Update commands for the widgets
-                self.a3min.on_changed(haircut.update)
-                self.a3max.on_changed(haircut.update)
-                self.a3minres.on_clicked(barbicide.a3min)
-                self.a3maxres.on_clicked(barbicide.a3max)
-
-            if (self.clients >= 4) & (idx == 3):
-                #Maximum value in parameter space 'client'
-                self.a4min = Slider(Sax[int(2*idx)], 'Min '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.lowers[client][0])
-                #Minimum value in parameter space 'client'
-                self.a4max = Slider(Sax[int(2*idx)+1], 'Max '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.uppers[client][0])
-
-                #Reset button for minimum slider
-                l = Sax[int(2*idx)].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a4minres = Button(tax, 'Reset '+client+' Min', color=axcolor, hovercolor='0.7')
-                #Reset button for maximum slider
-                l = Sax[int(2*idx)+1].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a4maxres = Button(tax, 'Reset '+client+' Max', color=axcolor, hovercolor='0.7')
-
-                #Update commands for the widgets
-                self.a4min.on_changed(haircut.update)
-                self.a4max.on_changed(haircut.update)
-                self.a4minres.on_clicked(barbicide.a4min)
-                self.a4maxres.on_clicked(barbicide.a4max)
-
-            if (self.clients == 5) & (idx == 4):
-                #Maximum value in parameter space 'client'
-                self.a5min = Slider(Sax[int(2*idx)], 'Min '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.lowers[client][0])
-                #Minimum value in parameter space 'client'
-                self.a5max = Slider(Sax[int(2*idx)+1], 'Max '+client,\
-                                np.nanmin(self.seating[client]),\
-                                np.nanmax(self.seating[client]),\
-                                valinit = self.uppers[client][0])
-
-                #Reset button for minimum slider
-                l = Sax[int(2*idx)].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a5minres = Button(tax, 'Reset '+client+' Min', color=axcolor, hovercolor='0.7')
-                #Reset button for maximum slider
-                l = Sax[int(2*idx)+1].get_position()
-                tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
-                self.a5maxres = Button(tax, 'Reset '+client+' Max', color=axcolor, hovercolor='0.7')
-
-                #Update commands for the widgets
-                self.a5min.on_changed(haircut.update)
-                self.a5max.on_changed(haircut.update)
-                self.a5minres.on_clicked(barbicide.a5min)
-                self.a5maxres.on_clicked(barbicide.a5max)
+            #Minimum value in parameter space 'client'
+            self.mins[client] = Slider(Sax[int(2*idx)], 'Min '+client,\
+                            self.seating.describe(client)['min'],\
+                            self.seating.describe(client)['max'],\
+                            valinit = self.lowers[client][0])
+            #Maximum value in parameter space 'client'
+            self.maxs[client] = Slider(Sax[int(2*idx)+1], 'Max '+client,\
+                            self.seating.describe(client)['min'],\
+                            self.seating.describe(client)['max'],\
+                            valinit = self.uppers[client][0])
+            #Reset button for minimum slider
+            l = Sax[int(2*idx)].get_position()
+            tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
+            self.minres[client] = Button(tax, 'Reset '+client+' Min', color=axcolor, hovercolor='0.7')
+            #Reset button for maximum slider
+            l = Sax[int(2*idx)+1].get_position()
+            tax = plt.axes([l.x0+l.width+0.08, l.y0, 0.18, l.height])
+            self.maxres[client] = Button(tax, 'Reset '+client+' Max', color=axcolor, hovercolor='0.7')
+
+            #Update commands for the widgets, each moving only its own bound
+            self.mins[client].on_changed(haircut.trimmer(client, 'lower'))
+            self.maxs[client].on_changed(haircut.trimmer(client, 'upper'))
+            self.minres[client].on_clicked(barbicide.reset(self.mins[client]))
+            self.maxres[client].on_clicked(barbicide.reset(self.maxs[client]))
+
+        #Buttons choosing the client the single scatter is coloured by
+        if self.layout == 'selector':
+            rax = self.figs[0].add_axes([0.02, 0.5-0.025*self.clients, 0.15, 0.05*self.clients])
+            self.selector = RadioButtons(rax, list(self.lowers))
+            self.selector.on_clicked(haircut.recolour)
 
         #Build the Save, Close Plots, Reset All commands
         y0 = (Sax[-1].get_position().y0) - (Sax[0].get_position().y0 - Sax[1].get_position().y0)
@@ -461,51 +712,93 @@ class open:
         self.resetbut = Button(tax, 'Reset All', color=axcolor, hovercolor='orange')
         self.resetbut.on_clicked(barbicide.all)
 
+        #Build the Undo and Redo commands, stepping through the history of cuts
+        y1 = y0 - (Sax[0].get_position().y0 - Sax[1].get_position().y0)
+        tax = plt.axes([l.x0, y1, (l.width-0.05)/2, l.height])
+        self.undobut = Button(tax, 'Undo', color=axcolor, hovercolor='0.7')
+        self.undobut.on_clicked(haircut.undo)
+
+        tax = plt.axes([l.x0+(l.width-0.05)/2+0.05, y1, (l.width-0.05)/2, l.height])
+        self.redobut = Button(tax, 'Redo', color=axcolor, hovercolor='0.7')
+        self.redobut.on_clicked(haircut.redo)
+
+        tax = plt.axes([l.x0+l.width+0.08, y1, 0.18, l.height])
+        self.clearbut = Button(tax, 'Clear Lasso', color=axcolor, hovercolor='0.7')
+        self.clearbut.on_clicked(haircut.clear)
+
         plt.show()
 
+    def show_browser(self, doc=None, port=5006):
+        '''
+        A function that shows the same plots, sliders and buttons as
+        show_mirror(), drawn with Bokeh in the browser. The data and the cuts
+        stay in Python: the browser is sent a fixed sample of at most
+        'maxpoints' rows once (see render_mode), and after every slider
+        change only the rows of it that entered or left the cut.
+
+        Parameters:
+            doc (bokeh.document.Document): Default None. The document to draw
+                in, e.g. curdoc() in a script run with 'bokeh serve'. In a
+                notebook, call bokeh.io.output_notebook() and then
+                bokeh.io.show(barber.show_browser). If None, a local Bokeh
+                server is started and opened in the browser.
+
+            port (int): Default 5006. The port of the local Bokeh server.
+
+        Returns:
+            bokeh_functions.mirrorclass: The mirror drawn in 'doc', if given.
+        '''
+        if self.clients == 0:
+            print('Please add at least one client variable.')
+            return None
+
+        from .bokeh_functions import mirrorclass, serve
+        if doc is not None:
+            mirror = mirrorclass(self)
+            mirror.build(doc)
+            return mirror
+        #Every browser session gets a mirror of its own
+        serve(lambda doc: mirrorclass(self).build(doc), port)
+
     def get_shells(self):
         '''
         Simple class that returns N empty figures where N is the number of
-        variables added using the add_client() function.
+        variables added using the add_client() function. In 'subplots' layout
+        the same figure is returned N times, with N subplots, and in
+        'selector' layout a single figure and axis are returned.
         '''
         if self.clients == 0:
             print('Please add at least one client variable.')
             return None
 
-        if self.clients == 1:
-            f1, a1 = plt.subplots()
-            return [f1], [a1]
-
-        if self.clients == 2:
-            f1, a1 = plt.subplots()
-            f2, a2 = plt.subplots()
-            return (f1, f2), (a1, a2)
-
-        if self.clients == 3:
-            f1, a1 = plt.subplots()
-            f2, a2 = plt.subplots()
-            f3, a3 = plt.subplots()
-            return (f1, f2, f3), (a1, a2, a3)
-
-        if self.clients == 4:
-            f1, a1 = plt.subplots()
-            f2, a2 = plt.subplots()
-            f3, a3 = plt.subplots()
-            f4, a4 = plt.subplots()
-            return (f1, f2, f3, f4), (a1, a2, a3, a4)
-
-        if self.clients == 5:
-            f1, a1 = plt.subplots()
-            f2, a2 = plt.subplots()
-            f3, a3 = plt.subplots()
-            f4, a4 = plt.subplots()
-            f5, a5 = plt.subplots()
-            return (f1, f2, f3, f4, f5), (a1, a2, a3, a4, a5)
+        import matplotlib.pyplot as plt
+        if self.layout == 'selector':
+            f, a = plt.subplots()
+            #Leave room for the buttons choosing the client
+            f.subplots_adjust(left=0.3)
+            return [f], [a]
+
+        if self.layout == 'subplots':
+            ncols = int(np.ceil(np.sqrt(self.clients)))
+            nrows = int(np.ceil(self.clients / ncols))
+            f, a = plt.subplots(nrows, ncols, squeeze=False, figsize=(5*ncols, 4*nrows))
+            a = list(a.flat)
+            for extra in a[self.clients:]:
+                extra.set_visible(False)
+            return [f]*self.clients, a[:self.clients]
+
+        figs, axes = [], []
+        for client in list(self.lowers):
+            f, a = plt.subplots()
+            figs.append(f)
+            axes.append(a)
+        return figs, axes
 
     def shave(self, lower, upper):
         '''
-        A function that takes the full data array 'self.odf' and applies cuts
-        according to the values fed in.
+        A function that takes the full data store 'self.seating' and applies cuts
+        according to the values fed in. Only the masks of clients whose cuts
+        have changed since the last call are recomputed.
 
         Parameters:
             lower (pandas.core.frame.DataFrame): A pandas Dataframe containing
@@ -519,28 +812,72 @@ class open:
                 cut data for all parameter spaces.
 
         '''
-        dff = self.seating[:]
-        #Apply cuts cyclicly for every client
-        for client in list(self.lowers):
-            dff = dff[dff[client] >= lower[client][0]]
-            dff = dff[dff[client] <= upper[client][0]]
+        #Combine the cached masks and index the data once
+        with self.timing.stage('shave', 'mask'):
+            selection = self.mask.update(lower, upper)
+        with self.timing.stage('shave', 'reindex'):
+            dff = self.seating.take(selection)
+        if self.timing.enabled:
+            self.timing.count('shave', len(self.seating), len(dff),\
+                              selection.nbytes + int(dff.memory_usage(index=False).sum()))
         return dff
 
     def check_seating(self):
-        print('Number of seats in use : '+str(self.clients)+'/5:')
+        print('Number of seats in use : '+str(self.clients)+':')
         print(list(self.lowers))
 
-    def give_savelocs(self, floc='dataframe_cut.csv', cloc='cuts.csv'):
+    def give_polygon(self, vertices=None):
+        '''
+        A function that cuts the data to a polygon in X and Y, as drawn with
+        the lasso in the client figures of show_mirror().
+
+        Parameters:
+            vertices (ndarray): Default None. The (X, Y) vertices of the
+                polygon, of shape (N, 2) with N at least 3. If None, the
+                polygon cut is removed.
+        '''
+        if vertices is not None:
+            vertices = np.asarray(vertices, dtype=float)
+            if vertices.ndim != 2 or vertices.shape[1] != 2 or len(vertices) < 3:
+                print('Please enter the polygon as at least three (X, Y) vertices.')
+                return None
+        self.polygon = vertices
+
+    def give_savelocs(self, floc='dataframe_cut.csv', cloc='cuts.csv', chunksize=1000000,\
+                        sloc='selection.npz', saveout='dataframe'):
         '''
         A function to be called by the user to feed in custom locations to save
         the output of the module.
 
         Parameters:
             floc (str): Default 'dataframe_cut.csv'. The output location of the
-                cut version of the DataFrame fed into barbershop.open().
+                cut version of the DataFrame fed into barbershop.open(). The
+                format is chosen from the extension: '.parquet', '.feather',
+                '.h5' and '.npy' are written as binary files, anything else
+                as a space separated .csv.
 
             cloc (str): Default 'cuts.csv'. The output location of the list of
-                cuts made to the data.
+                cuts made to the data. If it ends in '.json', a versioned file
+                that also records the column dtypes is written instead. A
+                polygon cut is saved within .json files, and next to .csv
+                files as e.g. 'cuts_polygon.json'.
+
+            chunksize (int): Default 1000000. The number of rows of the
+                DataFrame that are cut and written out at a time.
+
+            sloc (str): Default 'selection.npz'. The output location of the
+                file listing which rows survived the cuts. It can be applied
+                to the DataFrame again with barbershop.apply_selection().
+
+            saveout (str): Default 'dataframe'. What to save: 'dataframe' (the
+                cut DataFrame to floc), 'selection' (only the surviving rows
+                to sloc), or 'both'. The cuts are always saved to cloc.
         '''
+        if saveout not in ['dataframe', 'selection', 'both']:
+            print('Please choose saveout from dataframe, selection or both.')
+            return None
         self.floc = floc
         self.cloc = cloc
+        self.chunksize = chunksize
+        self.sloc = sloc
+        self.saveout = saveout
@@ -0,0 +1,190 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A collection of functions that apply a saved set of cuts to many catalogues
+without opening the GUI, spread over a pool of processes. It can also be run
+from the console by its location, e.g.:
+
+    python barbershop/barbershop_1.0_functions/batch_functions.py cuts.json 'data/*.csv' -o cut/
+
+or, where this directory is importable as 'barbershop', as
+'python -m barbershop.batch_functions'.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import os
+import glob as glob
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+
+if not __package__:
+    #Run as a script, or imported as one by the workers of a spawned pool, so
+    #load the rest of the package from this directory
+    from script_functions import load_package
+    __package__ = load_package()
+
+from .save_functions import get_cuts, get_polygon, save_cut
+from .polygon_functions import gridclass
+
+def get_catalogue(floc, sep=','):
+    '''
+    Reads in a catalogue, in a format chosen by the extension of 'floc':
+    '.parquet'/'.pq', '.feather'/'.arrow', '.h5'/'.hdf5'/'.hdf', '.npy', or
+    otherwise a delimited text file.
+
+    Parameters:
+        floc (str): The location of the catalogue.
+        sep (str): Default ','. The delimiter of text files.
+
+    Returns:
+        pandas.core.frame.DataFrame: The catalogue.
+    '''
+    ext = os.path.splitext(floc)[1].lower()
+    if ext in ['.parquet', '.pq']:
+        return pd.read_parquet(floc)
+    if ext in ['.feather', '.arrow']:
+        return pd.read_feather(floc)
+    if ext in ['.h5', '.hdf5', '.hdf']:
+        return pd.read_hdf(floc)
+    if ext == '.npy':
+        return pd.DataFrame(np.load(floc))
+    return pd.read_csv(floc, sep=sep)
+
+def get_mask(df, lowers, uppers, polygon=None):
+    '''
+    Applies the same cuts as open.shave() to a dataframe.
+
+    Parameters:
+        df (pandas.core.frame.DataFrame): The dataframe to cut.
+        lowers (pandas.core.frame.DataFrame): The lower boundary of the cut in
+            each parameter space.
+        uppers (pandas.core.frame.DataFrame): The upper boundary of the cut in
+            each parameter space.
+        polygon (dict): Default None. The polygon cut, from get_polygon().
+
+    Returns:
+        ndarray: A boolean array, True for every row surviving all cuts.
+    '''
+    mask = np.ones(len(df), dtype=bool)
+    for client in list(lowers):
+        values = df[client].to_numpy()
+        mask &= values >= lowers[client][0]
+        mask &= values <= uppers[client][0]
+    if polygon is not None:
+        grid = gridclass(df[polygon['x']].to_numpy(dtype=float), df[polygon['y']].to_numpy(dtype=float))
+        mask &= grid.inside(polygon['vertices'])
+    return mask
+
+def trim(floc, oloc, lowers, uppers, sep=',', chunksize=1000000, polygon=None):
+    '''
+    Cuts a single catalogue and writes out the rows that survive.
+
+    Parameters:
+        floc (str): The location of the catalogue.
+        oloc (str): The output location. The format is chosen from its
+            extension, as in save_functions.save_cut().
+        lowers (pandas.core.frame.DataFrame): The lower cut boundaries.
+        uppers (pandas.core.frame.DataFrame): The upper cut boundaries.
+        sep (str): Default ','. The delimiter of text catalogues.
+        chunksize (int): Default 1000000. The number of rows written at a time.
+        polygon (dict): Default None. The polygon cut, from get_polygon().
+
+    Returns:
+        int: The number of rows that survived the cuts.
+    '''
+    df = get_catalogue(floc, sep)
+    names = list(lowers) + ([polygon['x'], polygon['y']] if polygon is not None else [])
+    missing = set(names) - set(list(df))
+    if len(missing) > 0:
+        raise KeyError('The labels '+', '.join(sorted(missing))+' are not in '+floc+'.')
+    mask = get_mask(df, lowers, uppers, polygon)
+    save_cut(df, mask, oloc, chunksize)
+    return int(np.count_nonzero(mask))
+
+def apply_cuts(cfile, catalogues, outdir=None, ext=None, suffix='_cut',\
+                sep=',', processes=None, chunksize=1000000):
+    '''
+    A function that applies the cuts saved from the barbershop GUI to many
+    catalogues, in parallel and without plotting anything.
+
+    Parameters:
+        cfile (str): The location of the .csv or .json file of cuts.
+
+        catalogues (str or list): A glob pattern, or a list of locations, of
+            the catalogues to cut.
+
+        outdir (str): Default None. The directory the cut catalogues are saved
+            in. If None, each is saved next to its input.
+
+        ext (str): Default None. The extension, and hence format, of the cut
+            catalogues (e.g. '.parquet'). If None, the input format is kept.
+
+        suffix (str): Default '_cut'. Appended to the name of every output.
+
+        sep (str): Default ','. The delimiter of text catalogues.
+
+        processes (int): Default None. The number of worker processes. If
+            None, one per CPU is used.
+
+        chunksize (int): Default 1000000. The number of rows written at a time.
+
+    Returns:
+        dict: The number of surviving rows of every catalogue, keyed by the
+            output location. Catalogues that failed are reported and skipped.
+    '''
+    lowers, uppers, schema = get_cuts(cfile)
+    polygon = get_polygon(cfile)
+    if isinstance(catalogues, str):
+        catalogues = sorted(glob.glob(catalogues))
+    if len(catalogues) == 0:
+        print('No catalogues were found to cut.')
+        return {}
+
+    olocs = []
+    for floc in catalogues:
+        root, fext = os.path.splitext(floc)
+        if outdir is not None:
+            root = os.path.join(outdir, os.path.basename(root))
+        olocs.append(root + suffix + (fext if ext is None else ext))
+    if outdir is not None and not os.path.isdir(outdir):
+        os.makedirs(outdir)
+
+    out = {}
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        jobs = [pool.submit(trim, floc, oloc, lowers, uppers, sep, chunksize, polygon)\
+                for floc, oloc in zip(catalogues, olocs)]
+        for floc, oloc, job in zip(catalogues, olocs, jobs):
+            try:
+                out[oloc] = job.result()
+                print(floc+' : '+str(out[oloc])+' rows saved to '+oloc+'.')
+            except Exception as e:
+                #A failed worker must not stop the rest of the catalogues being reported
+                print(floc+' could not be cut: '+repr(e))
+    return out
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Apply cuts saved by barbershop to many catalogues.')
+    parser.add_argument('cfile', help='The .csv or .json file of cuts.')
+    parser.add_argument('catalogues', nargs='+', help='Catalogue locations or glob patterns.')
+    parser.add_argument('-o', '--outdir', default=None, help='Directory to save the cut catalogues in.')
+    parser.add_argument('-e', '--ext', default=None, help='Output extension, e.g. .parquet.')
+    parser.add_argument('-s', '--suffix', default='_cut', help='Suffix added to every output name.')
+    parser.add_argument('--sep', default=',', help='Delimiter of text catalogues.')
+    parser.add_argument('-j', '--processes', type=int, default=None, help='Number of worker processes.')
+    parser.add_argument('--chunksize', type=int, default=1000000, help='Rows written at a time.')
+    opts = parser.parse_args(args)
+
+    catalogues = []
+    for pattern in opts.catalogues:
+        catalogues += sorted(glob.glob(pattern)) or [pattern]
+    apply_cuts(opts.cfile, catalogues, opts.outdir, opts.ext, opts.suffix,\
+                opts.sep, opts.processes, opts.chunksize)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,229 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A benchmark suite for the hot paths of barbershop: building the GUI, updating
+it as a slider moves, refreshing the histograms, and saving and reloading the
+cuts. It runs on synthetic catalogues under the headless Agg backend, and
+writes its results as JSON lines so that runs can be compared over time, e.g.:
+
+    python barbershop/barbershop_1.0_functions/benchmark_functions.py --sizes 1e4 1e6 --clients 1 5
+
+or, where this directory is importable as 'barbershop', as
+'python -m barbershop.benchmark_functions'.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import os
+import sys
+import json
+import time
+import platform
+import argparse
+import tempfile
+import tracemalloc
+import numpy as np
+import pandas as pd
+
+if not __package__:
+    #Run as a script, so load the rest of the package from this directory
+    from script_functions import load_package
+    __package__ = load_package()
+
+def get_catalogue(nrows, nclients, seed=0):
+    '''
+    Returns a synthetic catalogue with columns 'x', 'y' and 'c0' to 'c<N-1>',
+    drawn from correlated normal distributions, with 1% of client values NaN.
+
+    Parameters:
+        nrows (int): The number of rows.
+        nclients (int): The number of client columns.
+        seed (int): Default 0. The random seed.
+    '''
+    rng = np.random.default_rng(seed)
+    x = rng.normal(size=nrows)
+    df = pd.DataFrame({'x': x, 'y': x + rng.normal(size=nrows)})
+    for idx in range(nclients):
+        values = 0.5*x + rng.normal(size=nrows)
+        values[rng.random(nrows) < 0.01] = np.nan
+        df['c'+str(idx)] = values
+    return df
+
+class timerclass:
+    def __init__(self, _memory=False):
+        '''
+        A class that times stages of a benchmark, and optionally the peak memory
+        allocated during each of them, as seen by tracemalloc.
+
+        Parameters:
+            _memory (bool): Default False. If True, tracemalloc is used to find
+                the peak memory of every stage. This slows down Python code
+                considerably, so timings taken with it are not comparable to
+                those taken without.
+        '''
+        self.memory = _memory
+        self.results = {}
+
+    def stage(self, name, func, *args):
+        '''
+        Runs func(*args), and records its wall time and peak memory under
+        'name'. Repeated stages of the same name are all kept.
+
+        Returns:
+            The output of func.
+        '''
+        if self.memory:
+            tracemalloc.reset_peak()
+            start = tracemalloc.get_traced_memory()[0]
+        t0 = time.perf_counter()
+        out = func(*args)
+        t1 = time.perf_counter()
+        peak = tracemalloc.get_traced_memory()[1] - start if self.memory else None
+        self.results.setdefault(name, []).append((t1 - t0, peak))
+        return out
+
+    def record(self, name, seconds):
+        '''
+        Records a time measured elsewhere under 'name', without its memory.
+        '''
+        self.results.setdefault(name, []).append((seconds, None))
+
+    def summary(self):
+        '''
+        Returns the median and maximum time (s) of every stage, and the maximum
+        peak memory (bytes) if it was tracked.
+        '''
+        out = {}
+        for name, runs in self.results.items():
+            times = np.array([run[0] for run in runs])
+            out[name] = {'runs': len(runs),\
+                         'median_s': float(np.median(times)),\
+                         'max_s': float(np.max(times))}
+            peaks = [run[1] for run in runs if run[1] is not None]
+            if self.memory and len(peaks) > 0:
+                out[name]['peak_bytes'] = int(max(peaks))
+        return out
+
+def get_maxrss():
+    '''
+    Returns the peak resident memory of this process so far in bytes, or None
+    where this is not available.
+    '''
+    try:
+        import resource
+    except ImportError:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    #Linux reports kilobytes, macOS bytes
+    return int(maxrss) if sys.platform == 'darwin' else int(maxrss)*1024
+
+def run(nrows, nclients, ticks=20, histograms=True, memory=False, seed=0):
+    '''
+    Benchmarks a single catalogue size and number of clients.
+
+    Parameters:
+        nrows (int): The number of rows.
+        nclients (int): The number of clients.
+        ticks (int): Default 20. The number of slider moves to time.
+        histograms (bool): Default True. Whether to turn on both histograms.
+        memory (bool): Default False. Whether to track the peak memory of
+            every stage with tracemalloc, at the cost of slower timings.
+        seed (int): Default 0. The random seed.
+
+    Returns:
+        dict: The settings and the summary of every stage.
+    '''
+    import matplotlib.pyplot as plt
+    plt.switch_backend('Agg')
+    from . import open as barbershop
+    from .save_functions import get_cuts, apply_selection
+
+    rng = np.random.default_rng(seed)
+    df = get_catalogue(nrows, nclients, seed)
+    timer = timerclass(memory)
+    if memory:
+        tracemalloc.start()
+    try:
+        #Quietly build the barbershop, as add_client() prints as it goes
+        stdout, sys.stdout = sys.stdout, open(os.devnull, 'w')
+        try:
+            barber = timer.stage('open', barbershop, df, 'x', 'y')
+            for idx in range(nclients):
+                timer.stage('add_client', barber.add_client, 'c'+str(idx))
+        finally:
+            sys.stdout.close()
+            sys.stdout = stdout
+        barber.histograms_on(x=histograms, y=histograms)
+        barber.slider_mode(interval=0)
+        timer.stage('show_mirror', barber.show_mirror)
+
+        #Move a random slider to a random position, one tick at a time. Each
+        #update is split into its parts by the barbershop's own instrumentation
+        haircut = barber.haircut
+        clients = list(barber.lowers)
+        barber.instrument()
+        for tick in range(ticks):
+            client = clients[rng.integers(len(clients))]
+            stats = barber.seating.describe(client)
+            val = stats['min'] + rng.random()*(stats['max'] - stats['min'])/2
+            haircut.lower[client] = [val]
+            barber.timing.reset()
+            timer.stage('update', haircut.update, None)
+            last = barber.timing.last
+            timer.record('mask', last['shave']['mask'])
+            timer.record('shave', sum(last['shave'].values()))
+            timer.record('redraw', sum(last['update'].values()))
+            if histograms:
+                timer.record('histograms', sum(last['histograms'].values()))
+        barber.instrument(False)
+
+        #Save out and read back in every output
+        with tempfile.TemporaryDirectory() as tmp:
+            barber.give_savelocs(os.path.join(tmp, 'cut.parquet'), os.path.join(tmp, 'cuts.json'),\
+                                 sloc=os.path.join(tmp, 'selection.npz'), saveout='both')
+            timer.stage('save', haircut.save, None)
+            timer.stage('reload_cuts', get_cuts, barber.cloc)
+            timer.stage('reload_selection', apply_selection, df, barber.sloc)
+            try:
+                timer.stage('reload_dataframe', pd.read_parquet, barber.floc)
+            except ImportError:
+                pass
+    finally:
+        if memory:
+            tracemalloc.stop()
+        plt.close('all')
+
+    return {'rows': nrows, 'clients': nclients, 'ticks': ticks,\
+            'histograms': histograms, 'maxrss_bytes': get_maxrss(),\
+            'stages': timer.summary()}
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description='Benchmark the hot paths of barbershop.')
+    parser.add_argument('--sizes', nargs='+', type=float, default=[1e4, 1e5, 1e6],\
+                        help='Numbers of rows to benchmark, up to 1e8.')
+    parser.add_argument('--clients', nargs='+', type=int, default=[1, 5],\
+                        help='Numbers of clients to benchmark.')
+    parser.add_argument('--ticks', type=int, default=20, help='Slider moves timed per run.')
+    parser.add_argument('--no-histograms', action='store_true', help='Turn the histograms off.')
+    parser.add_argument('--memory', action='store_true', help='Track peak memory per stage (slows timings).')
+    parser.add_argument('-o', '--out', default='benchmarks.jsonl', help='File the results are appended to.')
+    opts = parser.parse_args(args)
+
+    stamp = time.strftime('%Y-%m-%dT%H:%M:%S')
+    for nrows in opts.sizes:
+        for nclients in opts.clients:
+            result = run(int(nrows), nclients, opts.ticks, not opts.no_histograms, opts.memory)
+            result.update({'time': stamp, 'python': platform.python_version(),\
+                           'numpy': np.__version__, 'pandas': pd.__version__,\
+                           'machine': platform.machine(), 'cpus': os.cpu_count()})
+            with open(opts.out, 'a') as f:
+                f.write(json.dumps(result)+'\n')
+            print(str(int(nrows))+' rows, '+str(nclients)+' clients: '+\
+                  ', '.join(name+' '+'%.4f' % stage['median_s']+'s'\
+                            for name, stage in result['stages'].items()))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,246 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A browser mirror for __init__.open(), drawn with Bokeh. The full data and the
+cut engine stay in Python: the browser is sent a fixed, downsampled view of the
+data once, and after every slider change only the rows of that view whose fate
+has changed are patched, along with the colour limits and histogram counts.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import numpy as np
+import pandas as pd
+
+try:
+    import bokeh.palettes
+    from bokeh.models import ColumnDataSource, LinearColorMapper, ColorBar,\
+                             RangeSlider, Button, RadioButtonGroup, Div
+    from bokeh.plotting import figure
+    from bokeh.layouts import row, column, gridplot
+except ImportError:
+    raise ImportError('Please install Bokeh to use the browser mirror.')
+
+from .save_functions import save_cut, save_selection, save_cuts
+
+#The Bokeh palettes the clients are coloured by, in turn
+PALETTES = ['Viridis256', 'Plasma256', 'Cividis256', 'Inferno256', 'Magma256']
+
+class mirrorclass:
+    def __init__(self, _barber):
+        '''
+        A class that builds the browser mirror of a barbershop and keeps it in
+        line with the cuts.
+
+        Parameters:
+            _barber (barbershop.open): The barbershop class to mirror.
+        '''
+        self.barber = _barber
+        #The current slider values of every client
+        self.lower = {client: [self.barber.lowers[client][0]] for client in list(self.barber.lowers)}
+        self.upper = {client: [self.barber.uppers[client][0]] for client in list(self.barber.uppers)}
+
+    def build(self, doc):
+        '''
+        Adds the plots, sliders and buttons to a Bokeh document, for a single
+        browser session.
+
+        Parameters:
+            doc (bokeh.document.Document): The document to fill.
+        '''
+        barber = self.barber
+        seating = barber.seating
+        clients = list(barber.lowers)
+        selection = barber.mask.update(self.lower, self.upper)
+
+        #The rows sent to the browser: all of them, or a fixed random sample
+        if len(seating) <= barber.maxpoints:
+            self.rows = np.arange(len(seating))
+        else:
+            self.rows = np.sort(np.random.default_rng().choice(len(seating), barber.maxpoints, replace=False))
+        self.keep = selection[self.rows]
+        data = {'x': seating[barber.namex][self.rows], 'y': seating[barber.namey][self.rows],\
+                'alpha': self.keep.astype(float)}
+        for client in clients:
+            data[client] = seating[client][self.rows]
+        self.source = ColumnDataSource(data)
+
+        #Build the client plots, of which 'selector' layout draws only one
+        self.coloured = clients[:1] if barber.layout == 'selector' else clients
+        self.mappers, self.glyphs, self.colorbars, plots = [], [], [], []
+        for client in self.coloured:
+            low, high = self.get_limits(client)
+            mapper = LinearColorMapper(palette=self.get_palette(client), low=low, high=high)
+            p = figure(title=client, x_axis_label=barber.namex, y_axis_label=barber.namey,\
+                       tools='pan,wheel_zoom,box_zoom,reset,save', output_backend='webgl')
+            glyph = p.scatter('x', 'y', source=self.source, size=4, line_color=None,\
+                              fill_color={'field': client, 'transform': mapper}, fill_alpha='alpha')
+            colorbar = ColorBar(color_mapper=mapper, title=client)
+            p.add_layout(colorbar, 'right')
+            self.mappers.append(mapper)
+            self.glyphs.append(glyph)
+            self.colorbars.append(colorbar)
+            plots.append(p)
+        ncols = int(np.ceil(np.sqrt(len(plots))))
+        panels = [gridplot(plots, ncols=ncols, width=450, height=400)]
+        if barber.layout == 'selector':
+            self.selector = RadioButtonGroup(labels=clients, active=0)
+            self.selector.on_change('active', self.recolour)
+            panels.insert(0, self.selector)
+
+        #Histograms of the cut data on fixed bins, with the initial cut in red
+        self.hists = []
+        names = [name for name, on in [(barber.namex, barber.hist_x_on),\
+                                       (barber.namey, barber.hist_y_on)] if on]
+        bins = max(int(np.sqrt(np.count_nonzero(selection))), 1)
+        hplots = []
+        for name in names:
+            values = seating[name][selection]
+            counts, edges = np.histogram(values[np.isfinite(values)], bins=bins)
+            source = ColumnDataSource({'left': edges[:-1], 'right': edges[1:], 'top': counts})
+            p = figure(x_axis_label=name, y_axis_label='Counts', width=450, height=250)
+            p.step(edges[:-1], counts, mode='after', color='red', legend_label='Initial Cut')
+            p.quad(left='left', right='right', top='top', bottom=0, source=source,\
+                   fill_color=None, line_color='black', legend_label='Post-Cuts')
+            self.hists.append((name, edges, source))
+            hplots.append(p)
+
+        #One range slider per client
+        self.sliders = {}
+        for client in clients:
+            stats = seating.describe(client)
+            self.sliders[client] = RangeSlider(title=client, start=stats['min'], end=stats['max'],\
+                                    value=(self.lower[client][0], self.upper[client][0]),\
+                                    step=(stats['max']-stats['min'])/1000 or 1, width=400)
+            #In 'release' mode only the final value of a drag is sent
+            event = 'value_throttled' if barber.slidermode == 'release' else 'value'
+            self.sliders[client].on_change(event, self.trimmer(client))
+
+        self.count = Div(text=self.get_count(selection))
+        savebut = Button(label='Save Cuts', button_type='success')
+        savebut.on_click(self.save)
+        resetbut = Button(label='Reset All', button_type='warning')
+        resetbut.on_click(self.reset)
+
+        controls = column(list(self.sliders.values()) + [self.count, row(savebut, resetbut)])
+        doc.add_root(row(column(panels + hplots), controls))
+        doc.title = 'barbershop'
+
+    def trimmer(self, client):
+        '''
+        Returns a slider callback that moves the bounds of a single client
+        before updating the browser.
+
+        Parameters:
+            client (str): The name of the client the slider belongs to.
+        '''
+        def trim(attr, old, new):
+            self.lower[client] = [new[0]]
+            self.upper[client] = [new[1]]
+            self.update()
+        return trim
+
+    def update(self):
+        '''
+        Recomputes the cut in Python and patches the browser with only what
+        has changed: the rows of the view that entered or left the cut, the
+        colour limits and the histogram counts.
+        '''
+        timing = self.barber.timing
+        with timing.stage('browser', 'mask'):
+            selection = self.barber.mask.update(self.lower, self.upper)
+
+        with timing.stage('browser', 'patch'):
+            keep = selection[self.rows]
+            changed = np.flatnonzero(keep != self.keep)
+            self.keep = keep
+            if 2*len(changed) > len(keep):
+                #When most rows change, the column is cheaper sent whole
+                self.source.patch({'alpha': [(slice(0, len(keep)), keep.astype(float).tolist())]})
+            elif len(changed) > 0:
+                self.source.patch({'alpha': list(zip(changed.tolist(), keep[changed].astype(float).tolist()))})
+
+            for client, mapper in zip(self.coloured, self.mappers):
+                limits = self.barber.mask.limits(client)
+                if limits is not None:
+                    mapper.update(low=float(limits[0]), high=float(limits[1]))
+
+        with timing.stage('browser', 'histogram'):
+            for name, edges, source in self.hists:
+                counts = np.histogram(self.barber.seating[name][selection], bins=edges)[0]
+                bins = np.flatnonzero(counts != np.asarray(source.data['top']))
+                if len(bins) > 0:
+                    source.patch({'top': list(zip(bins.tolist(), counts[bins].tolist()))})
+
+        self.count.text = self.get_count(selection)
+        if timing.enabled:
+            timing.count('browser', len(selection), int(np.count_nonzero(selection)), len(changed))
+
+    def recolour(self, attr, old, new):
+        '''
+        Colours the single plot of the 'selector' layout by another client.
+        '''
+        client = list(self.barber.lowers)[new]
+        self.coloured = [client]
+        low, high = self.get_limits(client)
+        self.mappers[0].update(palette=self.get_palette(client), low=low, high=high)
+        self.glyphs[0].glyph.fill_color = {'field': client, 'transform': self.mappers[0]}
+        self.colorbars[0].title = client
+
+    def reset(self):
+        for client, slider in self.sliders.items():
+            slider.value = (self.barber.lowers[client][0], self.barber.uppers[client][0])
+
+    def save(self):
+        #Define cut dataframes from the current slider values
+        lower = pd.DataFrame(self.lower)
+        upper = pd.DataFrame(self.upper)
+        polygon = None
+        if self.barber.polygon is not None:
+            polygon = {'x': self.barber.namex, 'y': self.barber.namey, 'vertices': self.barber.polygon}
+        selection = self.barber.mask.update(lower, upper)
+
+        if self.barber.saveout in ['dataframe', 'both']:
+            save_cut(self.barber.core_df, selection, self.barber.floc, self.barber.chunksize)
+        if self.barber.saveout in ['selection', 'both']:
+            save_selection(selection, self.barber.sloc)
+        save_cuts(lower, upper, self.barber.cloc, self.barber.core_df, polygon)
+
+    def get_limits(self, client):
+        '''
+        Returns the colour limits of a client: its range among the selected
+        rows, or its full range if no rows are selected.
+        '''
+        limits = self.barber.mask.limits(client)
+        if limits is None:
+            stats = self.barber.seating.describe(client)
+            limits = (stats['min'], stats['max'])
+        return float(limits[0]), float(limits[1])
+
+    def get_palette(self, client):
+        name = PALETTES[list(self.barber.lowers).index(client) % len(PALETTES)]
+        return getattr(bokeh.palettes, name)
+
+    def get_count(self, selection):
+        return '<b>'+str(int(np.count_nonzero(selection)))+'</b> of '+str(len(selection))+\
+               ' rows survive the cuts.'
+
+def serve(app, port=5006):
+    '''
+    Runs a Bokeh application on a local server and opens it in the browser.
+    This blocks until the server is stopped.
+
+    Parameters:
+        app (function): Called as app(doc) for every browser session.
+        port (int): Default 5006. The port to serve on.
+    '''
+    from bokeh.server.server import Server
+
+    server = Server({'/': app}, port=port, num_procs=1)
+    server.start()
+    print('The barbershop is open at http://localhost:'+str(port)+'/')
+    server.io_loop.add_callback(server.show, '/')
+    server.io_loop.start()
@@ -0,0 +1,158 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A cache directory in which __init__.open() keeps the sorted indices, column
+statistics, histogram baselines and masks it computes, so that they can be
+read back in by later sessions on the same data instead of being recomputed.
+Entries are keyed by a fingerprint of the data they were computed from, and
+are read back in as memory maps. The least recently used entries are deleted
+once the directory outgrows its size limit.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import os
+import glob as glob
+import hashlib
+import numpy as np
+
+class diskcacheclass:
+    def __init__(self, _floc, _maxbytes=2**30):
+        '''
+        A class that keeps arrays as .npy files in a directory, named after a
+        hash of the key they are kept under.
+
+        Parameters:
+            _floc (str): The cache directory, which is created if needed.
+            _maxbytes (int): Default 2**30. The largest size of the directory.
+        '''
+        self.floc = os.path.expanduser(_floc)
+        self.maxbytes = _maxbytes
+        self.fingerprints = {}
+        if not os.path.isdir(self.floc):
+            os.makedirs(self.floc)
+
+    def __contains__(self, key):
+        return os.path.exists(self.get_path(key))
+
+    def get_path(self, key):
+        return os.path.join(self.floc, hashlib.sha1(get_text(key).encode('utf-8')).hexdigest()+'.npy')
+
+    def get(self, *key):
+        '''
+        Returns the array kept under a key as a read-only memory map, or None
+        if it is not in the cache.
+        '''
+        path = self.get_path(key)
+        try:
+            values = np.load(path, mmap_mode='r')
+            #Mark the entry as recently used
+            os.utime(path)
+        except (IOError, ValueError):
+            return None
+        return values
+
+    def put(self, values, *key):
+        '''
+        Keeps an array under a key, then deletes the least recently used
+        entries until the directory fits within 'maxbytes'.
+        '''
+        path = self.get_path(key)
+        if os.path.exists(path):
+            return None
+        #Write to a temporary file first, so a half written entry is never read
+        tmp = path[:-4]+'.'+str(os.getpid())+'.tmp.npy'
+        try:
+            np.save(tmp, np.asarray(values))
+            os.replace(tmp, path)
+        except IOError as e:
+            print('Could not write to the cache directory: '+str(e))
+            return None
+        self.evict()
+
+    def evict(self):
+        entries = []
+        for path in glob.glob(os.path.join(self.floc, '*.npy')):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime, stat.st_size, path))
+        total = sum(size for mtime, size, path in entries)
+        for mtime, size, path in sorted(entries):
+            if total <= self.maxbytes:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+
+    def fingerprint(self, barber, name):
+        '''
+        Returns the fingerprint of a column of the store of a barbershop,
+        computing it once per session. Columns of catalogues read from disk
+        are fingerprinted by the size and modification time of their files,
+        and all others by a hash of their data.
+
+        Parameters:
+            barber (barbershop.open): The barbershop class.
+            name (str): The name of the column.
+
+        Returns:
+            str: A hexadecimal hash.
+        '''
+        if name not in self.fingerprints:
+            values = barber.seating[name]
+            fingerprint = hashlib.sha1(get_text((name, len(values), values.dtype.str)).encode('utf-8'))
+            parts = getattr(barber.core_df, 'parts', None)
+            if parts is not None:
+                for part in parts:
+                    stat = os.stat(part)
+                    fingerprint.update(get_text((os.path.abspath(part), stat.st_size,\
+                                                 stat.st_mtime_ns)).encode('utf-8'))
+            else:
+                fingerprint.update(memoryview(np.ascontiguousarray(values)).cast('B'))
+            self.fingerprints[name] = fingerprint.hexdigest()
+        return self.fingerprints[name]
+
+    def forget(self, name=None):
+        '''
+        Drops the fingerprint of a column, or of all columns if 'name' is None,
+        so that it is found again from the data now in the store.
+        '''
+        if name is None:
+            self.fingerprints = {}
+        else:
+            self.fingerprints.pop(name, None)
+
+def get_text(key):
+    '''
+    Writes out a key, made of nested tuples of strings, numbers and bytes, as
+    text that is the same in every session.
+    '''
+    if isinstance(key, (tuple, list)):
+        return '('+','.join(get_text(part) for part in key)+')'
+    if isinstance(key, bytes):
+        return hashlib.sha1(key).hexdigest()
+    if isinstance(key, (float, np.floating)):
+        return repr(float(key))
+    if isinstance(key, (int, np.integer)):
+        return str(int(key))
+    return repr(key)
+
+def pack_stats(stats):
+    '''
+    Packs the statistics of a column from storeclass.describe() into an array.
+    '''
+    return np.concatenate(([stats['min'], stats['max'], stats['nans']], stats['quantiles'])).astype(float)
+
+def unpack_stats(values):
+    '''
+    Unpacks the statistics of a column written by pack_stats().
+    '''
+    return {'min': values[0], 'max': values[1], 'nans': int(values[2]),\
+            'quantiles': np.array(values[3:])}
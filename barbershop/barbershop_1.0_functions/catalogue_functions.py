@@ -0,0 +1,180 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A catalogue that stands in for the pandas DataFrame fed into __init__.open()
+when the data does not fit in memory. Only the columns that are asked for
+(X, Y and the clients) are read in, and the full rows are only ever read one
+chunk at a time, when the cut data is saved out.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import os
+import glob as glob
+import numpy as np
+import pandas as pd
+
+#The file extensions a catalogue, or a chunk of one, can be read from
+EXTENSIONS = ['.parquet', '.pq', '.feather', '.arrow', '.h5', '.hdf5', '.hdf', '.npy', '.csv', '.txt']
+
+class catalogueclass:
+    def __init__(self, _floc, _sep=','):
+        '''
+        A class that reads columns of a catalogue on demand. The catalogue can
+        be one of:
+            -A directory of 1D .npy files, one per column and named after it,
+                which are memory-mapped rather than read in.
+            -A single .npy structured array, which is memory-mapped.
+            -A single .parquet, .feather, .h5 (table format) or text file.
+            -A directory of such files, each holding a chunk of the rows, in
+                the order given by their sorted file names.
+
+        Parameters:
+            _floc (str): The location of the catalogue.
+            _sep (str): Default ','. The delimiter of text files.
+        '''
+        self.floc = _floc
+        self.sep = _sep
+        self.cache = {}
+        self.length = None
+
+        if os.path.isdir(self.floc):
+            self.parts = sorted(part for part in glob.glob(os.path.join(self.floc, '*'))\
+                                if os.path.splitext(part)[1].lower() in EXTENSIONS)
+        else:
+            self.parts = [self.floc]
+        if len(self.parts) == 0:
+            raise IOError('No catalogue files were found in '+self.floc+'.')
+
+        #A directory of unstructured .npy files holds one column per file
+        self.bycolumn = all(os.path.splitext(part)[1].lower() == '.npy' for part in self.parts)\
+                        and (len(self.parts) > 1 or os.path.isdir(self.floc))\
+                        and np.load(self.parts[0], mmap_mode='r').dtype.names is None
+        if self.bycolumn:
+            self.columns = [os.path.splitext(os.path.basename(part))[0] for part in self.parts]
+        else:
+            self.columns = list(get_names(self.parts[0], self.sep))
+
+    def __len__(self):
+        if self.length is None:
+            self[self.columns[0]]
+        return self.length
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @property
+    def index(self):
+        return pd.RangeIndex(len(self))
+
+    def __getitem__(self, name):
+        '''
+        Reads in a single column, which is kept for later calls.
+
+        Parameters:
+            name (str): The name of the column.
+
+        Returns:
+            pandas.core.series.Series: The column.
+        '''
+        if name not in self.columns:
+            raise KeyError(name)
+        if name not in self.cache:
+            if self.bycolumn:
+                values = np.load(self.parts[self.columns.index(name)], mmap_mode='r')
+            else:
+                values = np.concatenate([get_part(part, [name], self.sep)[name].to_numpy()\
+                                         for part in self.parts])
+            self.length = len(values)
+            self.cache[name] = pd.Series(values, name=name, copy=False)
+        return self.cache[name]
+
+    def get_chunks(self, chunksize):
+        '''
+        Yields every column of the catalogue, one chunk of rows at a time.
+
+        Parameters:
+            chunksize (int): The largest number of rows in each chunk.
+        '''
+        if self.bycolumn:
+            columns = [np.load(part, mmap_mode='r') for part in self.parts]
+            nrows = len(columns[0])
+            for start in range(0, max(nrows, 1), chunksize):
+                stop = min(start + chunksize, nrows)
+                yield pd.DataFrame({name: values[start:stop] for name, values\
+                                    in zip(self.columns, columns)},\
+                                    index=pd.RangeIndex(start, stop))
+            return
+        start = 0
+        for part in self.parts:
+            for chunk in iter_part(part, chunksize, self.sep):
+                chunk.index = pd.RangeIndex(start, start+len(chunk))
+                start += len(chunk)
+                yield chunk
+
+def get_names(floc, sep=','):
+    '''
+    Returns the column names of a catalogue file, without reading its rows.
+    '''
+    ext = os.path.splitext(floc)[1].lower()
+    if ext in ['.parquet', '.pq']:
+        import pyarrow.parquet as pq
+        return pq.read_schema(floc).names
+    if ext in ['.feather', '.arrow']:
+        import pyarrow as pa
+        return pa.ipc.open_file(pa.memory_map(floc)).schema.names
+    if ext in ['.h5', '.hdf5', '.hdf']:
+        return pd.read_hdf(floc, stop=0).columns
+    if ext == '.npy':
+        return np.load(floc, mmap_mode='r').dtype.names
+    return pd.read_csv(floc, sep=sep, nrows=0).columns
+
+def get_part(floc, columns, sep=','):
+    '''
+    Reads in only the given columns of a catalogue file.
+    '''
+    ext = os.path.splitext(floc)[1].lower()
+    if ext in ['.parquet', '.pq']:
+        return pd.read_parquet(floc, columns=columns)
+    if ext in ['.feather', '.arrow']:
+        return pd.read_feather(floc, columns=columns)
+    if ext in ['.h5', '.hdf5', '.hdf']:
+        return pd.read_hdf(floc, columns=columns)
+    if ext == '.npy':
+        data = np.load(floc, mmap_mode='r')
+        return pd.DataFrame({name: np.asarray(data[name]) for name in columns})
+    return pd.read_csv(floc, sep=sep, usecols=columns)
+
+def iter_part(floc, chunksize, sep=','):
+    '''
+    Yields every column of a catalogue file, one chunk of rows at a time.
+    '''
+    ext = os.path.splitext(floc)[1].lower()
+    if ext in ['.parquet', '.pq']:
+        import pyarrow.parquet as pq
+        for batch in pq.ParquetFile(floc).iter_batches(batch_size=chunksize):
+            yield batch.to_pandas()
+    elif ext in ['.feather', '.arrow']:
+        import pyarrow as pa
+        reader = pa.ipc.open_file(pa.memory_map(floc))
+        for idx in range(reader.num_record_batches):
+            batch = reader.get_batch(idx)
+            for start in range(0, batch.num_rows, chunksize):
+                yield batch.slice(start, chunksize).to_pandas()
+    elif ext in ['.h5', '.hdf5', '.hdf']:
+        with pd.HDFStore(floc, mode='r') as store:
+            for chunk in store.select(store.keys()[0], chunksize=chunksize):
+                yield chunk
+    elif ext == '.npy':
+        data = np.load(floc, mmap_mode='r')
+        for start in range(0, len(data), chunksize):
+            yield pd.DataFrame(np.asarray(data[start:start+chunksize]))
+    else:
+        for chunk in pd.read_csv(floc, sep=sep, chunksize=chunksize):
+            yield chunk
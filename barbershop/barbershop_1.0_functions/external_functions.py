@@ -11,69 +11,38 @@ the button functions.
 """
 
 from matplotlib import pyplot as plt
+from matplotlib.backend_bases import TimerBase
 import pandas as pd
 import numpy as np
 
+from .save_functions import save_cut, save_selection, save_cuts
+from .worker_functions import workerclass
+from .history_functions import historyclass
+
 class barbicideclass:
     def __init__(self, _barber):
         self.barber = _barber
 
     def all(self, event):
-        try:
-            self.barber.a1min.reset()
-            self.barber.a1max.reset()
-        except AttributeError:
-            pass
-        try:
-            self.barber.a2min.reset()
-            self.barber.a2max.reset()
-        except AttributeError:
-            pass
-        try:
-            self.barber.a3min.reset()
-            self.barber.a3max.reset()
-        except AttributeError:
-            pass
-        try:
-            self.barber.a4min.reset()
-            self.barber.a4max.reset()
-        except AttributeError:
-            pass
-        try:
-            self.barber.a5min.reset()
-            self.barber.a5max.reset()
-        except AttributeError:
-            pass
-
-    def a1min(self, event):
-        self.barber.a1min.reset()
-
-    def a1max(self, event):
-        self.barber.a1max.reset()
-
-    def a2min(self, event):
-        self.barber.a2min.reset()
-
-    def a2max(self, event):
-        self.barber.a2max.reset()
-
-    def a3min(self, event):
-        self.barber.a3min.reset()
-
-    def a3max(self, event):
-        self.barber.a3max.reset()
-
-    def a4min(self, event):
-        self.barber.a4min.reset()
-
-    def a4max(self, event):
-        self.barber.a4max.reset()
-
-    def a5min(self, event):
-        self.barber.a5min.reset()
-
-    def a5max(self, event):
-        self.barber.a5max.reset()
+        for client in list(self.barber.mins):
+            self.barber.mins[client].reset()
+            self.barber.maxs[client].reset()
+        #The release of the click has already been handled, so draw the reset here
+        self.barber.haircut.flush()
+        self.barber.haircut.remember()
+
+    def reset(self, slider):
+        '''
+        Returns a button callback that resets a single slider.
+
+        Parameters:
+            slider (matplotlib.widgets.Slider): The slider to reset.
+        '''
+        def reset(event):
+            slider.reset()
+            self.barber.haircut.flush()
+            self.barber.haircut.remember()
+        return reset
 
     def plots(self, event):
         plt.close('all')
@@ -81,148 +50,507 @@ class barbicideclass:
 class haircutclass:
     def __init__(self, _barber):
         self.barber = _barber
+        #The current slider values of every client
+        self.lower = {client: [self.barber.lowers[client][0]] for client in list(self.barber.lowers)}
+        self.upper = {client: [self.barber.uppers[client][0]] for client in list(self.barber.uppers)}
+        #State of the update scheduler
+        self.timer = None
+        self.pending = False
+        self.dirty = False
+        #Background worker and the timer that polls it for results
+        self.worker = None
+        self.poller = None
+        #Earlier cuts, stepped through by undo() and redo()
+        self.history = historyclass(self.barber.depth)
+        self.remember()
+
+    def trimmer(self, client, bound):
+        '''
+        Returns a slider callback that moves a single bound of a single client
+        before updating the plots.
+
+        Parameters:
+            client (str): The name of the client the slider belongs to.
+            bound (str): Either 'lower' or 'upper'.
+        '''
+        cuts = getattr(self, bound)
+        def trim(val):
+            cuts[client] = [val]
+            self.estimate()
+            self.schedule()
+        return trim
+
+    def estimate(self):
+        '''
+        Shows the number of rows that would survive the current slider values,
+        as estimated from the binned summary of the data, and the number kept
+        by each client's cut alone, which is exact for indexed clients.
+        Nothing is done if it is turned off.
+        '''
+        if not self.barber.summary or self.barber.cube is None:
+            return None
+        cube, mask = self.barber.cube, self.barber.mask
+        alone = []
+        for client in list(self.lower):
+            #Indexed clients are counted exactly, by a binary search of their sorted values
+            if client in mask.sorted:
+                lo, hi = mask.span(client, self.lower[client][0], self.upper[client][0])
+                alone.append('%s %d' % (client, hi - lo))
+            else:
+                alone.append('%s ~%d' % (client, cube.count({client: self.lower[client]},\
+                                                             {client: self.upper[client]})))
+        self.barber.counttext.set_text('~%d of %d rows survive the cuts (%s)' %\
+                (cube.count(self.lower, self.upper), len(self.barber.seating), ', '.join(alone)))
+
+    def schedule(self):
+        '''
+        Asks for the plots to be updated to the current slider values. In
+        'drag' mode, a timer is started on the first request and any further
+        requests before it fires are combined into the same update. In
+        'release' mode the update waits for release().
+        '''
+        self.dirty = True
+        if self.barber.slidermode == 'release' or self.pending:
+            return None
+        if self.timer is None:
+            self.timer = self.barber.Sfig.canvas.new_timer(interval=self.barber.interval)
+            self.timer.single_shot = True
+            self.timer.add_callback(self.flush)
+        #Backends without an event loop have timers that never fire
+        if self.barber.interval <= 0 or type(self.timer) is TimerBase:
+            self.flush()
+            return None
+        self.pending = True
+        self.timer.start()
+
+    def flush(self):
+        '''
+        Updates the plots to the latest slider values, if they have changed.
+        In background mode the cut is handed to the worker instead.
+        '''
+        self.pending = False
+        if not self.dirty:
+            return None
+        self.dirty = False
+        if self.barber.background and self.start_worker():
+            #Hand over a copy, as the sliders keep changing the originals
+            self.worker.submit({client: list(val) for client, val in self.lower.items()},\
+                               {client: list(val) for client, val in self.upper.items()})
+        else:
+            self.update(None)
+
+    def release(self, event):
+        #The end of a drag is drawn straight away, and kept in the history
+        self.flush()
+        self.remember()
+
+    def remember(self):
+        '''
+        Adds the current slider values and polygon to the history of cuts,
+        and keeps the masks of the latest computed cut in the cache of the cut
+        engine, so that returning to it does not recompute it.
+        '''
+        bounds = {client: (self.lower[client][0], self.upper[client][0]) for client in list(self.lower)}
+        polygon = self.barber.polygon
+        state = (bounds, None if polygon is None else tuple(map(tuple, polygon)))
+        if not self.history.push(state):
+            return None
+        if self.worker is not None:
+            #Kept by the worker once it has cut them, so the GUI never waits
+            self.worker.defer(self.barber.mask.keep)
+        else:
+            self.barber.mask.keep()
+
+    def undo(self, event):
+        self.restore(self.history.back())
+
+    def redo(self, event):
+        self.restore(self.history.forward())
+
+    def keypress(self, event):
+        if event.key in ['ctrl+z', 'cmd+z']:
+            self.undo(event)
+        elif event.key in ['ctrl+y', 'cmd+y', 'ctrl+Z', 'cmd+Z']:
+            self.redo(event)
+
+    def restore(self, state):
+        '''
+        Moves the sliders and polygon to a cut from the history, and updates
+        the plots once.
+
+        Parameters:
+            state (tuple): The (lower, upper) bounds of every client and the
+                vertices of the polygon, or None to do nothing.
+        '''
+        if state is None:
+            return None
+        for client, bounds in state[0].items():
+            if client not in self.lower:
+                continue
+            for sliders, cuts, val in zip([self.barber.mins, self.barber.maxs],\
+                                          [self.lower, self.upper], bounds):
+                #Move the slider without sending an update for every bound
+                sliders[client].eventson = False
+                sliders[client].set_val(val)
+                sliders[client].eventson = True
+                cuts[client] = [val]
+        self.set_polygon(state[1])
+        self.dirty = True
+        self.flush()
+
+    def lasso(self, vertices):
+        '''
+        Cuts the data to the polygon drawn with the lasso in a client figure.
+
+        Parameters:
+            vertices (list): The (X, Y) vertices of the polygon.
+        '''
+        if len(vertices) < 3:
+            return None
+        self.set_polygon(vertices)
+        self.dirty = True
+        self.flush()
+        self.remember()
+
+    def clear(self, event):
+        if self.barber.polygon is None:
+            return None
+        self.set_polygon(None)
+        self.dirty = True
+        self.flush()
+        self.remember()
+
+    def set_polygon(self, vertices):
+        '''
+        Sets the polygon cut and outlines it in every client figure.
+
+        Parameters:
+            vertices (list): The (X, Y) vertices of the polygon, or None to
+                remove the polygon cut.
+        '''
+        if vertices is None:
+            self.barber.polygon = None
+            closed = np.empty((0, 2))
+        else:
+            self.barber.polygon = np.array(vertices, dtype=float)
+            closed = np.vstack((self.barber.polygon, self.barber.polygon[:1]))
+        for line in self.barber.outlines:
+            line.set_data(closed[:,0], closed[:,1])
+
+    def start_worker(self):
+        '''
+        Starts the background worker and a timer polling it for results, if
+        not already running. Returns False if the backend has no event loop
+        to run the timer, in which case cuts are computed in the foreground.
+        '''
+        if self.worker is not None:
+            return True
+        self.poller = self.barber.Sfig.canvas.new_timer(interval=max(self.barber.interval, 10))
+        if type(self.poller) is TimerBase:
+            self.poller = None
+            return False
+        self.poller.add_callback(self.poll)
+        self.worker = workerclass(self.compute)
+        self.poller.start()
+        return True
+
+    def poll(self):
+        result = self.worker.collect()
+        if result is not None:
+            self.draw(result)
+
+    def recolour(self, label):
+        '''
+        Colours the single scatter of the 'selector' layout by another client.
+
+        Parameters:
+            label (str): The name of the client chosen.
+        '''
+        panel = self.barber.panels[0]
+        panel[2] = label
+        artist = panel[1].images[0] if self.barber.drawmode == 'density' else panel[1].collections[0]
+        artist.set_cmap(self.barber.cmaps[list(self.barber.lowers).index(label) % len(self.barber.cmaps)])
+        self.barber.cbars[0].set_label(label)
+        self.dirty = True
+        self.flush()
 
     def update(self, val):
-        #Define cut dataframes
-        lower = pd.DataFrame()
-        upper = pd.DataFrame()
-
-        #Append the slider cut values into this local dataframe
-        for idx, client in enumerate(list(self.barber.lowers)):
-            if (self.barber.clients >= 1) & (idx == 0):
-                lower[client] = [self.barber.a1min.val]
-                upper[client] = [self.barber.a1max.val]
-
-            if (self.barber.clients >= 2) & (idx == 1):
-                lower[client] = [self.barber.a2min.val]
-                upper[client] = [self.barber.a2max.val]
-
-            if (self.barber.clients >= 3) & (idx == 2):
-                lower[client] = [self.barber.a3min.val]
-                upper[client] = [self.barber.a3max.val]
-
-            if (self.barber.clients >= 4) & (idx == 3):
-                lower[client] = [self.barber.a4min.val]
-                upper[client] = [self.barber.a4max.val]
-
-            if (self.barber.clients == 5) & (idx == 4):
-                lower[client] = [self.barber.a5min.val]
-                upper[client] = [self.barber.a5max.val]
+        self.draw(self.compute(None, self.lower, self.upper))
+
+    def compute(self, generation, lower, upper):
+        '''
+        Computes everything needed to redraw the plots for a set of cuts,
+        without touching any of the figures, so that it is safe to run on the
+        background worker.
+
+        Parameters:
+            generation (int): The request number given by the worker, or None
+                when run in the foreground.
+            lower (dict): The lower boundary of the cut in each parameter space.
+            upper (dict): The upper boundary of the cut in each parameter space.
+
+        Returns:
+            dict: The cut data and everything drawn from it, or None if a
+                newer request arrived before it was finished.
+        '''
+        stale = lambda: generation is not None and self.worker.stale(generation)
+        clients = [panel[2] for panel in self.barber.panels]
 
         #Get new, cut dataset
         dff = self.barber.shave(lower, upper)
+        result = {'dff': dff}
+        if stale():
+            return None
 
         #Prep the data for update
-        uu = np.vstack((dff[self.barber.namex].values, dff[self.barber.namey].values))
-
-        #Update all the axes and colourbars
-        for idx, client in enumerate(list(self.barber.lowers)):
-            self.barber.axes[idx].collections[0].set_offsets(uu.T)
-            self.barber.axes[idx].collections[0].set_array(dff[client])
-            try:
-                self.barber.axes[idx].collections[0].set_clim([np.nanmin(dff[client]),np.nanmax(dff[client])])
-            except ValueError:
-                pass
-            self.barber.figs[idx].canvas.draw_idle()
+        with self.barber.timing.stage('update', 'offsets'):
+            if self.barber.drawmode == 'density':
+                result['images'] = get_density(self.barber, dff, clients)
+            else:
+                dpl = get_sample(self.barber, dff)
+                #The positions are shared by every panel, only the colours differ
+                result['offsets'] = np.vstack((dpl[self.barber.namex].values, dpl[self.barber.namey].values)).T
+                result['arrays'] = [dpl[client].values for client in clients]
+        if stale():
+            return None
+
+        with self.barber.timing.stage('update', 'limits'):
+            result['limits'] = [self.barber.mask.limits(client) for client in clients]
+        with self.barber.timing.stage('histograms', 'histogram'):
+            result['counts'] = get_histcounts(self.barber, dff)
+        return result
+
+    def draw(self, result):
+        '''
+        Updates all the axes, colourbars and histograms with the output of
+        compute(). This must run on the GUI thread.
+        '''
+        timing = self.barber.timing
+        figs = []
+        for idx, (fig, ax, client) in enumerate(self.barber.panels):
+            with timing.stage('update', 'set_offsets'):
+                if self.barber.drawmode == 'density':
+                    artist = ax.images[0]
+                    artist.set_data(result['images'][idx])
+                else:
+                    artist = ax.collections[0]
+                    artist.set_offsets(result['offsets'])
+                    artist.set_array(result['arrays'][idx])
+                if result['limits'][idx] is not None:
+                    artist.set_clim(result['limits'][idx])
+            #Figures shared by several panels are only redrawn once
+            if all(fig is not other for other in figs):
+                figs.append(fig)
+        with timing.stage('update', 'draw_idle'):
+            for fig in figs:
+                fig.canvas.draw_idle()
 
         #Update the histograms
-        get_histograms(self.barber, dff)
+        with timing.stage('histograms', 'histogram_draw'):
+            get_histograms(self.barber, result['dff'], result['counts'])
+
+        #Replace the estimated number of rows surviving with the exact one
+        if self.barber.summary:
+            self.barber.counttext.set_text('%d of %d rows survive the cuts' %\
+                                           (len(result['dff']), len(self.barber.seating)))
+            self.barber.Sfig.canvas.draw_idle()
+            #A summary turned on after show_mirror() is built here, ready for the next drag
+            if self.barber.cube is None:
+                self.barber.estimate()
+        elif self.barber.counttext.get_text():
+            self.barber.counttext.set_text('')
+            self.barber.Sfig.canvas.draw_idle()
+
+        if self.barber.overlay:
+            self.barber.overlaytext.set_text(timing.breakdown(['shave', 'update', 'histograms']))
+            self.barber.Sfig.canvas.draw_idle()
+        elif self.barber.overlaytext.get_text():
+            self.barber.overlaytext.set_text('')
+            self.barber.Sfig.canvas.draw_idle()
 
     def save(self, event):
-        #Define cut dataframes
-        lower = pd.DataFrame()
-        upper = pd.DataFrame()
-
-        #Append the slider cut values into this local dataframe
-        for idx, client in enumerate(list(self.barber.lowers)):
-            if (self.barber.clients >= 1) & (idx == 0):
-                lower[client] = [self.barber.a1min.val]
-                upper[client] = [self.barber.a1max.val]
-
-            if (self.barber.clients >= 2) & (idx == 1):
-                lower[client] = [self.barber.a2min.val]
-                upper[client] = [self.barber.a2max.val]
-
-            if (self.barber.clients >= 3) & (idx == 2):
-                lower[client] = [self.barber.a3min.val]
-                upper[client] = [self.barber.a3max.val]
-
-            if (self.barber.clients >= 4) & (idx == 3):
-                lower[client] = [self.barber.a4min.val]
-                upper[client] = [self.barber.a4max.val]
-
-            if (self.barber.clients == 5) & (idx == 4):
-                lower[client] = [self.barber.a5min.val]
-                upper[client] = [self.barber.a5max.val]
-
-        out = self.barber.core_df[:]
-        #Save out a cut verison of the original dataframe
-        for client in list(self.barber.lowers):
-            out = out[out[client] >= lower[client][0]]
-            out = out[out[client] <= upper[client][0]]
-        out.to_csv(self.barber.floc,header=True,sep=' ')
+        #Define cut dataframes from the current slider values
+        lower = pd.DataFrame(self.lower)
+        upper = pd.DataFrame(self.upper)
+        polygon = None
+        if self.barber.polygon is not None:
+            polygon = {'x': self.barber.namex, 'y': self.barber.namey, 'vertices': self.barber.polygon}
+
+        timing = self.barber.timing
+        with timing.stage('save', 'mask'):
+            if self.worker is not None:
+                #Wait for the worker to let go of the cut engine
+                self.worker.stop()
+                with self.worker.lock:
+                    selection = self.barber.mask.update(lower, upper).copy()
+            else:
+                selection = self.barber.mask.update(lower, upper)
+        #Save out a cut verison of the original dataframe, chunk by chunk
+        with timing.stage('save', 'write'):
+            if self.barber.saveout in ['dataframe', 'both']:
+                save_cut(self.barber.core_df, selection, self.barber.floc, self.barber.chunksize)
+            #Save out only which rows survived the cuts
+            if self.barber.saveout in ['selection', 'both']:
+                save_selection(selection, self.barber.sloc)
 
         #Save out the cuts if the user wants to apply them again
-        cut = pd.concat([lower, upper])
-        cut.index = ['lower','upper']
-        cut.to_csv(self.barber.cloc,header=True,sep=' ')
+        with timing.stage('save', 'cuts'):
+            save_cuts(lower, upper, self.barber.cloc, self.barber.core_df, polygon)
+        if timing.enabled:
+            timing.count('save', len(selection), int(np.count_nonzero(selection)), selection.nbytes)
 
         plt.close('all')
 
-def get_histograms(barber, dff):
-    uu = np.vstack((dff[barber.namex].values, dff[barber.namey].values))
-
-    # #Update histograms, if they exist
-    if any([barber.hist_x_on, barber.hist_y_on]):
-        if not all([barber.hist_x_on, barber.hist_y_on]):
-            #If only one histogram is turned on
-            barber.Hax.cla()
-            if barber.hist_x_on:
-                #Plot original line in red
-                barber.Hax.hist(\
-                    barber.shave(barber.lowers, barber.uppers)[barber.namex],\
-                    histtype='step', color='r', bins='sqrt', label='Initial Cut')
-                barber.Hax.set_ylabel('Counts')
-                barber.Hax.set_xlabel(barber.namex)
-                #Plot updated histogram with same bins
-                barber.Hax.hist(uu[0], histtype='step', color='k', bins=barber.bins, label='Post-Cuts')
-            else:
-                #Plot original line in red
-                barber.Hax.hist(\
-                    barber.shave(barber.lowers, barber.uppers)[barber.namey],\
-                    histtype='step', color='r', bins='sqrt', label='Initial Cut')
-                barber.Hax.set_ylabel('Counts')
-                barber.Hax.set_xlabel(barber.namey)
-                #Plot updated histogram with same bins
-                barber.Hax.hist(uu[1], histtype='step', color='k', bins=barber.bins, label='Post-Cuts')
-            barber.Hax.legend(loc='best',fancybox=True)
+def get_sample(barber, dff):
+    '''
+    Returns the rows of the cut data that are drawn in the client figures. In
+    'sample' mode these are the rows of the fixed random sample that survive
+    the cuts, otherwise they are all of the cut data.
+
+    Parameters:
+        barber (barbershop.open): The barbershop class, straight after a call
+            to shave() that produced 'dff'.
+        dff (pandas.core.frame.DataFrame): The data after the current cuts.
+
+    Returns:
+        pandas.core.frame.DataFrame: The rows to draw.
+    '''
+    if barber.drawmode != 'sample':
+        return dff
+    rows = barber.sample[barber.mask.selection[barber.sample]]
+    return barber.seating.take(rows)
+
+def get_density(barber, dff, clients):
+    '''
+    Bins the cut data in X and Y on the fixed edges set in show_mirror(), and
+    returns the mean value of every client in each bin. Empty bins are NaN.
+
+    Parameters:
+        barber (barbershop.open): The barbershop class.
+        dff (pandas.core.frame.DataFrame): The data after the current cuts.
+        clients (list): The names of the clients to bin.
+
+    Returns:
+        list: One 2D ndarray per client, indexed as [y, x] for imshow.
+    '''
+    x = dff[barber.namex].values
+    y = dff[barber.namey].values
+    bins = [barber.xedges, barber.yedges]
+    counts, _, _ = np.histogram2d(x, y, bins=bins)
+
+    images = []
+    for client in clients:
+        c = dff[client].values
+        sums, _, _ = np.histogram2d(x, y, bins=bins, weights=c)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            images.append((sums / counts).T)
+    return images
+
+def set_histograms(barber, dff):
+    '''
+    Builds the histograms of the data in X and/or Y. The "Initial Cut" baseline
+    and the bin edges are computed once here, and a step artist is created for
+    the post-cut counts which get_histograms() then updates in place.
+
+    Parameters:
+        barber (barbershop.open): The barbershop class the histograms belong to.
+        dff (pandas.core.frame.DataFrame): The data after the initial cuts.
+    '''
+    if not any([barber.hist_x_on, barber.hist_y_on]):
+        return None
+
+    #Pair every histogram axis with the parameter it shows
+    if not all([barber.hist_x_on, barber.hist_y_on]):
+        if barber.hist_x_on:
+            pairs = [(barber.Hax, barber.namex)]
         else:
-            #If both histograms are turned on
-            barber.Hax[0].cla()
-            barber.Hax[1].cla()
-            #Plot original line in red
-            barber.Hax[0].hist(\
-                barber.shave(barber.lowers, barber.uppers)[barber.namex],\
-                histtype='step', color='r', bins='sqrt', label='Initial Cut')
-            barber.Hax[1].hist(\
-                barber.shave(barber.lowers, barber.uppers)[barber.namey],\
-                histtype='step', color='r', bins='sqrt', label='Initial Cut')
-            #Plot updated histograms with same bins
-            barber.Hax[0].hist(uu[0],\
-                    histtype='step', color='k', bins='sqrt')
-            barber.Hax[1].hist(uu[1],\
-                    histtype='step', color='k', bins='sqrt')
-            barber.Hax[0].set_ylabel('Counts')
-            barber.Hax[0].set_xlabel(barber.namex)
-            barber.Hax[1].set_ylabel('Counts')
-            barber.Hax[1].set_xlabel(barber.namey)
-            barber.Hax[0].legend(loc='best', fancybox=True)
-            barber.Hax[1].legend(loc='best', fancybox=True)
-
-        barber.Hfig.suptitle('Histograms of the data. Pre-cuts shown in red.')
-        barber.Hfig.tight_layout(rect=[0, 0.03, 1, 0.95])
-
-        barber.Hfig.canvas.draw_idle()
+            pairs = [(barber.Hax, barber.namey)]
+    else:
+        pairs = [(barber.Hax[0], barber.namex), (barber.Hax[1], barber.namey)]
+
+    barber.hists = []
+    for ax, name in pairs:
+        counts, edges = get_baseline(barber, dff, name)
+        #Plot original line in red, and the updatable line on the same bins
+        ax.stairs(counts, edges, color='r', label='Initial Cut')
+        post = ax.stairs(counts, edges, color='k', label='Post-Cuts')
+        ax.set_ylabel('Counts')
+        ax.set_xlabel(name)
+        ax.legend(loc='best', fancybox=True)
+        barber.hists.append((ax, name, edges, counts.max(initial=0), post))
+
+    barber.Hfig.suptitle('Histograms of the data. Pre-cuts shown in red.')
+    barber.Hfig.tight_layout(rect=[0, 0.03, 1, 0.95])
+
+    barber.Hfig.canvas.draw_idle()
+
+def get_baseline(barber, dff, name):
+    '''
+    Bins the data after the initial cuts for the "Initial Cut" histogram,
+    reading the counts and bin edges from the cache directory if they are kept
+    there.
+
+    Parameters:
+        barber (barbershop.open): The barbershop class the histograms belong to.
+        dff (pandas.core.frame.DataFrame): The data after the initial cuts.
+        name (str): The parameter to bin.
+
+    Returns:
+        ndarray: The counts in each bin.
+        ndarray: The edges of the bins.
+    '''
+    if barber.disk is not None:
+        key = ('hist', barber.disk.fingerprint(barber, name), barber.bins)\
+              + barber.mask.get_disk_key(barber.mask.key(list(barber.lowers)))
+        counts, edges = barber.disk.get('counts', key), barber.disk.get('edges', key)
+        if counts is not None and edges is not None:
+            return np.array(counts), np.array(edges)
+    values = dff[name].values
+    counts, edges = np.histogram(values[np.isfinite(values)], bins=barber.bins)
+    if barber.disk is not None:
+        barber.disk.put(counts, 'counts', key)
+        barber.disk.put(edges, 'edges', key)
+    return counts, edges
+
+def get_histcounts(barber, dff):
+    '''
+    Bins the cut data on the fixed edges of the histograms built by
+    set_histograms().
+
+    Parameters:
+        barber (barbershop.open): The barbershop class the histograms belong to.
+        dff (pandas.core.frame.DataFrame): The data after the current cuts.
+
+    Returns:
+        list: The counts of every histogram, or None if they are turned off.
+    '''
+    if not any([barber.hist_x_on, barber.hist_y_on]):
+        return None
+    return [np.histogram(dff[name].values, bins=edges)[0]\
+            for ax, name, edges, base, post in barber.hists]
+
+def get_histograms(barber, dff, counts=None):
+    '''
+    Updates the post-cut histograms built by set_histograms() with the counts
+    of the newly cut data, keeping the bin edges fixed.
+
+    Parameters:
+        barber (barbershop.open): The barbershop class the histograms belong to.
+        dff (pandas.core.frame.DataFrame): The data after the current cuts.
+        counts (list): Default None. The counts from get_histcounts(), if
+            already computed.
+    '''
+    # #Update histograms, if they exist
+    if not any([barber.hist_x_on, barber.hist_y_on]):
+        return None
+    if counts is None:
+        counts = get_histcounts(barber, dff)
+
+    for (ax, name, edges, base, post), count in zip(barber.hists, counts):
+        post.set_data(count)
+        ax.set_ylim(0, 1.05*max(base, count.max(initial=0), 1))
+
+    barber.Hfig.canvas.draw_idle()
 
 def quartet():
     import webbrowser
@@ -0,0 +1,112 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The history of cuts stepped through by the Undo and Redo buttons of
+__init__.open().show_mirror(), and the memory-bounded cache of compressed masks
+that makes returning to an earlier cut instant.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+from collections import OrderedDict
+
+class historyclass:
+    def __init__(self, _depth=100):
+        '''
+        A class that holds a list of earlier cuts, and the position of the
+        current cut within it.
+
+        Parameters:
+            _depth (int): Default 100. The most cuts remembered. The oldest
+                are forgotten first.
+        '''
+        self.depth = max(_depth, 1)
+        self.states = []
+        self.position = -1
+
+    def push(self, state):
+        '''
+        Adds a cut after the current one, forgetting any cuts that had been
+        undone.
+
+        Parameters:
+            state (tuple): The cut, as the (lower, upper) bounds of every
+                client and the vertices of the polygon.
+
+        Returns:
+            bool: False if the cut is the same as the current one, in which
+                case nothing is added.
+        '''
+        if self.position >= 0 and self.states[self.position] == state:
+            return False
+        del self.states[self.position+1:]
+        self.states.append(state)
+        if len(self.states) > self.depth:
+            self.states.pop(0)
+        self.position = len(self.states) - 1
+        return True
+
+    def back(self):
+        '''
+        Steps back to the previous cut, returning it, or None if there is none.
+        '''
+        if self.position <= 0:
+            return None
+        self.position -= 1
+        return self.states[self.position]
+
+    def forward(self):
+        '''
+        Steps forward to the next cut, returning it, or None if there is none.
+        '''
+        if self.position >= len(self.states) - 1:
+            return None
+        self.position += 1
+        return self.states[self.position]
+
+class cacheclass:
+    def __init__(self, _maxbytes):
+        '''
+        A least recently used cache of arrays, limited by their total size.
+
+        Parameters:
+            _maxbytes (int): The largest number of bytes held at once.
+        '''
+        self.maxbytes = _maxbytes
+        self.items = OrderedDict()
+        self.nbytes = 0
+
+    def __contains__(self, key):
+        return key in self.items
+
+    def get(self, key):
+        '''
+        Returns the array kept under a key, or None if it is not in the cache.
+        '''
+        if key not in self.items:
+            return None
+        self.items.move_to_end(key)
+        return self.items[key]
+
+    def put(self, key, value):
+        '''
+        Keeps an array under a key, forgetting the least recently used arrays
+        until the cache fits within 'maxbytes'.
+        '''
+        if key in self.items:
+            self.items.move_to_end(key)
+            return None
+        if value.nbytes > self.maxbytes:
+            return None
+        self.items[key] = value
+        self.nbytes += value.nbytes
+        while self.nbytes > self.maxbytes:
+            key, value = self.items.popitem(last=False)
+            self.nbytes -= value.nbytes
+
+    def clear(self):
+        self.items = OrderedDict()
+        self.nbytes = 0
@@ -0,0 +1,472 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The cut engine used by __init__.open().shave(), which keeps one cached boolean
+mask per client so that a slider event only recomputes the client it moved.
+Clients may also carry a sorted index, in which case a cut is found with a
+binary search and only the rows between the old and new bounds are touched.
+Full evaluations are split into blocks of rows, spread over a pool of threads.
+Masks of earlier cuts may be kept, bit-packed, in a cache to be restored later.
+A polygon drawn in X and Y is cut as one more mask, found on a grid index.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+
+from .polygon_functions import gridclass
+
+class maskclass:
+    def __init__(self, _barber):
+        '''
+        A class that holds a boolean mask for every client in the barbershop,
+        along with the bounds each mask was computed for. When the cuts are
+        updated only clients whose bounds have changed are re-evaluated, after
+        which the masks are combined and the data is indexed a single time.
+
+        Parameters:
+            _barber (barbershop.open): The barbershop class containing the
+                'seating' store the cuts are applied to.
+        '''
+        self.barber = _barber
+        self.masks = {}
+        self.bounds = {}
+        self.orders = {}
+        self.sorted = {}
+        self.spans = {}
+        self.selection = None
+        self.threads = os.cpu_count() or 1
+        self.blocksize = 262144
+        self.pool = None
+        #A history_functions.cacheclass of bit-packed masks, or None
+        self.cache = None
+        #The grid index of X and Y, and the mask of the polygon cut
+        self.grid = None
+        self.region = None
+        self.vertices = None
+
+    def blocks(self, nrows):
+        '''
+        Splits a number of rows into consecutive blocks of 'self.blocksize'.
+
+        Parameters:
+            nrows (int): The number of rows.
+
+        Returns:
+            list: A slice for every block.
+        '''
+        return [slice(start, min(start+self.blocksize, nrows))\
+                for start in range(0, nrows, self.blocksize)]
+
+    def run(self, kernel, nrows):
+        '''
+        Calls a kernel on every block of rows. When there is more than one
+        block, the blocks are spread over the thread pool. NumPy releases the
+        GIL while it works, so the blocks are evaluated in parallel.
+
+        Parameters:
+            kernel (function): Called as kernel(block) with a slice of rows.
+                Kernels must only write to their own block.
+            nrows (int): The number of rows.
+        '''
+        blocks = self.blocks(nrows)
+        if self.threads <= 1 or len(blocks) <= 1:
+            for block in blocks:
+                kernel(block)
+            return None
+        if self.pool is None:
+            self.pool = ThreadPoolExecutor(max_workers=self.threads)
+        list(self.pool.map(kernel, blocks))
+
+    def index(self, name):
+        '''
+        Builds the sorted index of a client: the row order that sorts its
+        values, and the sorted non-NaN values themselves. Cuts in this client
+        are then answered with a binary search instead of a full scan.
+
+        Parameters:
+            name (str): The name of the client column in 'seating'.
+        '''
+        values = self.barber.seating[name]
+        #Catalogues in shared memory may carry a sorted index built once for everyone
+        get_index = getattr(self.barber.core_df, 'get_index', None)
+        shared = get_index(name) if get_index is not None else None
+        if shared is not None and shared[1].dtype != values.dtype:
+            shared = None
+        #Or it may have been kept in the cache directory by an earlier session
+        disk = self.barber.disk
+        if disk is not None:
+            fingerprint = disk.fingerprint(self.barber, name)
+        if shared is None and disk is not None:
+            order, svalues = disk.get('order', fingerprint), disk.get('sorted', fingerprint)
+            if order is not None and svalues is not None:
+                shared = order, svalues
+        if shared is not None:
+            self.orders[name], self.sorted[name] = shared
+        else:
+            self.orders[name], self.sorted[name] = get_sorted(values)
+            if disk is not None:
+                disk.put(self.orders[name], 'order', fingerprint)
+                disk.put(self.sorted[name], 'sorted', fingerprint)
+        self.masks.pop(name, None)
+        self.bounds.pop(name, None)
+        self.spans.pop(name, None)
+        self.selection = None
+
+    def forget(self, name=None):
+        '''
+        Drops the cached mask of a client, for example when it is evicted or
+        its data is replaced. If no name is given, all masks are dropped.
+
+        Parameters:
+            name (str): Default None. The name of the client to forget.
+        '''
+        if name is None:
+            self.masks = {}
+            self.bounds = {}
+            self.orders = {}
+            self.sorted = {}
+            self.spans = {}
+        else:
+            self.masks.pop(name, None)
+            self.bounds.pop(name, None)
+            self.orders.pop(name, None)
+            self.sorted.pop(name, None)
+            self.spans.pop(name, None)
+        self.selection = None
+        #Cached masks may belong to data that is no longer there
+        if self.cache is not None:
+            self.cache.clear()
+
+    def cut(self, client, lower, upper):
+        '''
+        Evaluates the mask of a single client.
+
+        Parameters:
+            client (str): The name of the client column in 'seating'.
+            lower (float): The lower boundary of the cut.
+            upper (float): The upper boundary of the cut.
+
+        Returns:
+            ndarray: A boolean array, True where the client lies within the
+                cut. NaN values are always excluded.
+        '''
+        if client in self.orders:
+            lo, hi = self.span(client, lower, upper)
+            mask = np.zeros(len(self.barber.seating), dtype=bool)
+            rows = self.orders[client][lo:hi]
+            def kernel(block):
+                mask[rows[block]] = True
+            self.run(kernel, len(rows))
+            self.spans[client] = (lo, hi)
+            return mask
+        self.scan([(client, (lower, upper))])
+        return self.masks[client]
+
+    def scan(self, cuts):
+        '''
+        Evaluates the masks of several clients by a full scan, in a single pass
+        over the blocks of rows, and stores them.
+
+        Parameters:
+            cuts (list): A (client, (lower, upper)) tuple for every client.
+        '''
+        nrows = len(self.barber.seating)
+        columns = [(self.barber.seating[client], np.empty(nrows, dtype=bool), lower, upper)\
+                   for client, (lower, upper) in cuts]
+        def kernel(block):
+            for values, mask, lower, upper in columns:
+                np.greater_equal(values[block], lower, out=mask[block])
+                mask[block] &= values[block] <= upper
+        self.run(kernel, nrows)
+        for (client, bounds), column in zip(cuts, columns):
+            self.masks[client] = column[1]
+
+    def span(self, client, lower, upper):
+        '''
+        Finds the range of positions in the sorted index of a client that
+        lie within a cut.
+
+        Parameters:
+            client (str): The name of an indexed client.
+            lower (float): The lower boundary of the cut.
+            upper (float): The upper boundary of the cut.
+
+        Returns:
+            tuple: The first and one-past-last sorted positions in the cut.
+        '''
+        svalues = self.sorted[client]
+        lo = np.searchsorted(svalues, lower, side='left')
+        hi = np.searchsorted(svalues, upper, side='right')
+        return lo, max(lo, hi)
+
+    def shift(self, client, lower, upper):
+        '''
+        Moves the cut of an indexed client to new bounds by flipping only the
+        rows that lie between the old and new bounds, in both the client mask
+        and the combined selection.
+
+        Parameters:
+            client (str): The name of an indexed client with a cached mask.
+            lower (float): The new lower boundary of the cut.
+            upper (float): The new upper boundary of the cut.
+        '''
+        order = self.orders[client]
+        mask = self.masks[client]
+        old = self.spans[client]
+        new = self.span(client, lower, upper)
+
+        for lo, hi in difference(old, new):
+            rows = order[lo:hi]
+            mask[rows] = False
+            if self.selection is not None:
+                self.selection[rows] = False
+
+        for lo, hi in difference(new, old):
+            rows = order[lo:hi]
+            mask[rows] = True
+            if self.selection is not None:
+                #A row only re-enters the selection if it passes every cut
+                keep = np.ones(len(rows), dtype=bool)
+                for other in self.masks.values():
+                    keep &= other[rows]
+                if self.region is not None:
+                    keep &= self.region[rows]
+                self.selection[rows] = keep
+
+        self.spans[client] = new
+
+    def update(self, lower, upper):
+        '''
+        Brings the cached masks in line with a new set of cuts and returns the
+        combined selection.
+
+        Parameters:
+            lower (pandas.core.frame.DataFrame): A pandas Dataframe containing
+                the lower boundary of the cut in each parameter space.
+
+            upper (pandas.core.frame.DataFrame): A pandas Dataframe containing
+                the upper boundary of the cut in each parameter space.
+
+        Returns:
+            ndarray: A boolean array, True for every row surviving all cuts.
+        '''
+        clients = list(self.barber.lowers)
+        nrows = len(self.barber.seating)
+
+        #Drop the masks of any clients that have left the barbershop
+        for client in list(self.masks):
+            if client not in clients:
+                self.forget(client)
+
+        #Only recompute the masks of clients whose bounds have moved
+        scans = []
+        for client in clients:
+            bounds = (lower[client][0], upper[client][0])
+            if self.bounds.get(client) == bounds:
+                continue
+            packed = self.recall((client,)+bounds)
+            if packed is not None:
+                #Cuts kept by keep() are unpacked rather than recomputed
+                self.masks[client] = np.unpackbits(packed, count=nrows).view(bool)
+                if client in self.orders:
+                    self.spans[client] = self.span(client, *bounds)
+                self.selection = None
+            elif client in self.spans and client in self.masks:
+                #Indexed clients only touch the rows between old and new bounds
+                self.shift(client, *bounds)
+            elif client in self.orders:
+                self.masks[client] = self.cut(client, *bounds)
+                self.selection = None
+            else:
+                scans.append((client, bounds))
+            self.bounds[client] = bounds
+
+        #Clients without an index are all evaluated in the same pass
+        if len(scans) > 0:
+            self.scan(scans)
+            self.selection = None
+
+        #The polygon in X and Y, if any, is found on the grid index
+        vertices = self.barber.polygon
+        if vertices is None:
+            if self.region is not None:
+                self.region, self.vertices = None, None
+                self.selection = None
+        elif self.vertices is None or not np.array_equal(vertices, self.vertices):
+            if self.grid is None:
+                self.grid = gridclass(self.barber.seating[self.barber.namex],\
+                                      self.barber.seating[self.barber.namey])
+            self.region = self.grid.inside(vertices)
+            self.vertices = np.array(vertices, dtype=float)
+            self.selection = None
+
+        if self.selection is None:
+            packed = self.recall(self.key(clients))
+            if packed is not None:
+                self.selection = np.unpackbits(packed, count=nrows).view(bool)
+            else:
+                self.selection = self.combine(clients)
+        return self.selection
+
+    def key(self, clients):
+        '''
+        Returns the cache key of the combined selection of the current cuts.
+        '''
+        polygon = None if self.vertices is None else self.vertices.tobytes()
+        return tuple((client,)+self.bounds[client] for client in clients) + (polygon,)
+
+    def keep(self):
+        '''
+        Packs the masks of every client, and the combined selection, into the
+        cache and the cache directory, so that update() can restore them should
+        the same cuts be asked for again.
+        '''
+        if (self.cache is None and self.barber.disk is None) or self.selection is None:
+            return None
+        clients = list(self.barber.lowers)
+        if any(client not in self.masks for client in clients):
+            return None
+        for client in clients:
+            self.store((client,)+self.bounds[client], self.masks[client])
+        self.store(self.key(clients), self.selection)
+
+    def get_disk_key(self, key):
+        '''
+        Swaps the client names in a cache key for fingerprints of their data,
+        so that the key holds in later sessions. Selections also depend on X
+        and Y, through the polygon.
+        '''
+        disk = self.barber.disk
+        fingerprint = lambda part: (disk.fingerprint(self.barber, part[0]),)+tuple(part[1:])
+        if isinstance(key[0], str):
+            return ('mask',)+fingerprint(key)
+        return ('selection', disk.fingerprint(self.barber, self.barber.namex),\
+                disk.fingerprint(self.barber, self.barber.namey))\
+                + tuple(fingerprint(part) for part in key[:-1]) + key[-1:]
+
+    def recall(self, key):
+        '''
+        Returns the packed mask kept under a cache key, from memory or else
+        from the cache directory, or None if it is in neither.
+        '''
+        packed = self.cache.get(key) if self.cache is not None else None
+        if packed is None and self.barber.disk is not None:
+            packed = self.barber.disk.get(*self.get_disk_key(key))
+        return packed
+
+    def store(self, key, mask):
+        '''
+        Packs a mask into the cache and the cache directory, if not already
+        there.
+        '''
+        if self.cache is not None and key not in self.cache:
+            self.cache.put(key, np.packbits(mask))
+        if self.barber.disk is not None:
+            key = self.get_disk_key(key)
+            if key not in self.barber.disk:
+                self.barber.disk.put(np.packbits(mask), *key)
+
+    def limits(self, client, block=4096):
+        '''
+        Returns the smallest and largest value of a client among the rows in
+        the current selection. For indexed clients these are found by walking
+        inwards from both ends of the cut in the sorted index, which usually
+        stops after a handful of rows.
+
+        Parameters:
+            client (str): The name of the client.
+            block (int): Default 4096. The number of sorted rows checked at a
+                time.
+
+        Returns:
+            tuple: The minimum and maximum, or None if no rows are selected.
+        '''
+        if client not in self.spans:
+            values = self.barber.seating[client][self.selection]
+            if len(values) == 0:
+                return None
+            return np.nanmin(values), np.nanmax(values)
+
+        order = self.orders[client]
+        svalues = self.sorted[client]
+        lo, hi = self.spans[client]
+        first = None
+        for start in range(lo, hi, block):
+            hit = np.flatnonzero(self.selection[order[start:min(start+block, hi)]])
+            if len(hit) > 0:
+                first = start + hit[0]
+                break
+        if first is None:
+            return None
+        for stop in range(hi, first, -block):
+            hit = np.flatnonzero(self.selection[order[max(stop-block, first):stop]])
+            if len(hit) > 0:
+                last = max(stop-block, first) + hit[-1]
+                break
+        return svalues[first], svalues[last]
+
+    def combine(self, clients):
+        '''
+        ANDs together the masks of all given clients, and of the polygon.
+
+        Parameters:
+            clients (list): The names of the clients to combine.
+
+        Returns:
+            ndarray: The combined boolean mask.
+        '''
+        nrows = len(self.barber.seating)
+        masks = [self.masks[client] for client in clients]
+        if self.region is not None:
+            masks.append(self.region)
+        if len(masks) == 0:
+            return np.ones(nrows, dtype=bool)
+        selection = np.empty(nrows, dtype=bool)
+        def kernel(block):
+            selection[block] = masks[0][block]
+            for mask in masks[1:]:
+                selection[block] &= mask[block]
+        self.run(kernel, nrows)
+        return selection
+
+def get_sorted(values):
+    '''
+    Builds the sorted index of a column.
+
+    Parameters:
+        values (ndarray): The values of the column.
+
+    Returns:
+        ndarray: The row order that sorts the non-NaN values.
+        ndarray: The sorted non-NaN values.
+    '''
+    order = np.argsort(values, kind='mergesort')
+    svalues = values[order]
+    #NaNs are sorted to the end and can never pass a cut
+    nvalid = len(svalues) - (np.count_nonzero(np.isnan(svalues)) if svalues.dtype.kind == 'f' else 0)
+    return order[:nvalid], svalues[:nvalid]
+
+def difference(a, b):
+    '''
+    Returns the parts of the position range 'a' that do not overlap with the
+    position range 'b'.
+
+    Parameters:
+        a (tuple): The first and one-past-last positions of the first range.
+        b (tuple): The first and one-past-last positions of the second range.
+
+    Returns:
+        list: Up to two (first, one-past-last) ranges.
+    '''
+    out = []
+    if a[0] < b[0]:
+        out.append((a[0], min(a[1], b[0])))
+    if a[1] > b[1]:
+        out.append((max(a[0], b[1]), a[1]))
+    return [(lo, hi) for lo, hi in out if hi > lo]
@@ -0,0 +1,142 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Polygon cuts in the X-Y plane, as drawn with the lasso in the client figures
+of __init__.open().show_mirror(). Points are binned once on a uniform grid, so
+that a polygon only needs to be tested exactly against the points in the grid
+cells its edges pass through. Every other cell lies wholly inside or outside
+the polygon, and is decided by testing its centre.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import numpy as np
+
+class gridclass:
+    def __init__(self, _x, _y, _percell=64):
+        '''
+        A class that bins a set of points on a uniform grid, keeping the rows
+        that fall in each cell.
+
+        Parameters:
+            _x (ndarray): The X values of the points.
+            _y (ndarray): The Y values of the points.
+            _percell (int): Default 64. The mean number of points per cell the
+                grid is sized for.
+        '''
+        self.x = _x
+        self.y = _y
+        finite = np.isfinite(self.x) & np.isfinite(self.y)
+        nfinite = int(np.count_nonzero(finite))
+        self.nside = int(min(max(np.sqrt(nfinite / _percell), 1), 4096))
+        if nfinite > 0:
+            self.xlim = (np.min(self.x[finite]), np.max(self.x[finite]))
+            self.ylim = (np.min(self.y[finite]), np.max(self.y[finite]))
+        else:
+            self.xlim, self.ylim = (0., 1.), (0., 1.)
+        self.width = (self.xlim[1] - self.xlim[0]) / self.nside or 1.
+        self.height = (self.ylim[1] - self.ylim[0]) / self.nside or 1.
+
+        #Points that are not finite go in an extra cell that is never inside
+        self.ncells = self.nside**2
+        self.cells = np.full(len(self.x), self.ncells, dtype=np.int32)
+        ix, iy = self.get_cell(self.x[finite], self.y[finite])
+        self.cells[finite] = iy*self.nside + ix
+        self.order = np.argsort(self.cells, kind='stable')
+        self.starts = np.searchsorted(self.cells[self.order], np.arange(self.ncells+1))
+
+    def get_cell(self, x, y):
+        '''
+        Returns the column and row of the cells holding a set of positions.
+        Positions beyond the grid are given the nearest cell.
+        '''
+        ix = np.clip(np.floor((x - self.xlim[0]) / self.width), 0, self.nside-1).astype(np.int32)
+        iy = np.clip(np.floor((y - self.ylim[0]) / self.height), 0, self.nside-1).astype(np.int32)
+        return ix, iy
+
+    def get_edges(self, vertices):
+        '''
+        Marks the cells the edges of a polygon pass through. Every edge is
+        walked in steps of half a cell, and the marks are then grown by one
+        cell to catch edges that only clip the corner of a cell.
+
+        Parameters:
+            vertices (ndarray): The (X, Y) vertices of the polygon.
+
+        Returns:
+            ndarray: A 2D boolean array, indexed as [row, column].
+        '''
+        edges = np.zeros((self.nside, self.nside), dtype=bool)
+        for start, stop in zip(vertices, np.roll(vertices, -1, axis=0)):
+            steps = 2*max(abs(stop[0]-start[0]) / self.width, abs(stop[1]-start[1]) / self.height)
+            t = np.linspace(0, 1, int(np.ceil(steps))+2)
+            ix, iy = self.get_cell(start[0] + t*(stop[0]-start[0]), start[1] + t*(stop[1]-start[1]))
+            edges[iy, ix] = True
+
+        grown = edges.copy()
+        grown[1:, :] |= edges[:-1, :]
+        grown[:-1, :] |= edges[1:, :]
+        edges = grown.copy()
+        grown[:, 1:] |= edges[:, :-1]
+        grown[:, :-1] |= edges[:, 1:]
+        return grown
+
+    def inside(self, vertices):
+        '''
+        Finds the points that lie inside a polygon.
+
+        Parameters:
+            vertices (ndarray): The (X, Y) vertices of the polygon, which is
+                closed between the last and first vertex.
+
+        Returns:
+            ndarray: A boolean array, True for every point inside the polygon.
+        '''
+        vertices = np.asarray(vertices, dtype=float)
+        if len(vertices) < 3:
+            return np.zeros(len(self.x), dtype=bool)
+
+        #Cells crossed by an edge are tested point by point, the rest by their centre
+        edges = self.get_edges(vertices)
+        iy, ix = np.nonzero(~edges)
+        full = np.zeros(self.ncells+1, dtype=bool)
+        full[iy*self.nside + ix] = contains(vertices, self.xlim[0] + (ix+0.5)*self.width,\
+                                                      self.ylim[0] + (iy+0.5)*self.height)
+        mask = full[self.cells]
+
+        iy, ix = np.nonzero(edges)
+        cells = iy*self.nside + ix
+        rows = np.concatenate([self.order[self.starts[cell]:self.starts[cell+1]] for cell in cells])
+        mask[rows] = contains(vertices, self.x[rows], self.y[rows])
+        return mask
+
+def contains(vertices, x, y):
+    '''
+    Tests which points lie inside a polygon, by counting the edges crossed by
+    a ray running from each point towards +X. The points are sorted in Y, so
+    that each edge is only compared with the points level with it.
+
+    Parameters:
+        vertices (ndarray): The (X, Y) vertices of the polygon.
+        x (ndarray): The X values of the points.
+        y (ndarray): The Y values of the points.
+
+    Returns:
+        ndarray: A boolean array, True for every point inside the polygon.
+            Points that are not finite are never inside.
+    '''
+    order = np.argsort(y)
+    xs, ys = x[order], y[order]
+    crossings = np.zeros(len(x), dtype=bool)
+    for (x0, y0), (x1, y1) in zip(vertices, np.roll(vertices, 1, axis=0)):
+        if y0 == y1:
+            continue
+        #The ray crosses the edge if the point lies in [min(y0, y1), max(y0, y1))
+        lo, hi = np.searchsorted(ys, [min(y0, y1), max(y0, y1)], side='left')
+        crossings[lo:hi] ^= xs[lo:hi] < x0 + (x1-x0) * (ys[lo:hi]-y0) / (y1-y0)
+    inside = np.empty(len(x), dtype=bool)
+    inside[order] = crossings
+    return inside
@@ -0,0 +1,383 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A collection of functions used by external_functions.haircutclass.save() to
+write out the cut version of a dataframe. The cut is applied and written one
+chunk of rows at a time, in a format chosen by the extension of the file.
+Alternatively only the positions of the surviving rows are saved, which can be
+applied to the dataframe again with apply_selection(). The cuts themselves are
+saved and read back in with save_cuts(), get_cuts() and get_polygon().
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+
+#The version of the .json cut file format written by save_cuts(). Version 2
+#adds the polygon cut, and is only written when there is one.
+CUTS_VERSION = 2
+
+def save_cut(df, selection, floc, chunksize=1000000):
+    '''
+    Writes out the rows of a dataframe that survive the cuts. The format is
+    chosen from the extension of 'floc':
+        -'.parquet' or '.pq': Apache Parquet (requires pyarrow)
+        -'.feather' or '.arrow': Feather/Arrow IPC (requires pyarrow)
+        -'.h5', '.hdf5' or '.hdf': HDF5 table (requires PyTables)
+        -'.npy': NumPy structured array of the columns (index not saved,
+            object columns saved as fixed-width strings)
+        -Anything else: space separated .csv, as in barbershop 1.0
+
+    Parameters:
+        df (pandas.core.frame.DataFrame): The full dataframe, or a catalogue
+            from catalogue_functions.
+        selection (ndarray): A boolean array, True for every row to keep.
+        floc (str): The output location.
+        chunksize (int): Default 1000000. The number of rows of 'df' that
+            are cut and written at a time.
+    '''
+    ext = os.path.splitext(floc)[1].lower()
+    if ext in ['.parquet', '.pq']:
+        save_parquet(df, selection, floc, chunksize)
+    elif ext in ['.feather', '.arrow']:
+        save_feather(df, selection, floc, chunksize)
+    elif ext in ['.h5', '.hdf5', '.hdf']:
+        save_hdf(df, selection, floc, chunksize)
+    elif ext == '.npy':
+        save_npy(df, selection, floc, chunksize)
+    else:
+        save_csv(df, selection, floc, chunksize)
+
+def get_chunks(df, selection, chunksize):
+    '''
+    Yields the cut dataframe one chunk at a time. At least one (possibly empty)
+    chunk is always returned, so that headers and schemas can be written.
+
+    Parameters:
+        df (pandas.core.frame.DataFrame): The full dataframe, or a catalogue
+            from catalogue_functions, which is read one chunk at a time.
+        selection (ndarray): A boolean array, True for every row to keep.
+        chunksize (int): The number of rows of 'df' in each chunk.
+    '''
+    if hasattr(df, 'get_chunks'):
+        start = 0
+        for chunk in df.get_chunks(chunksize):
+            yield chunk[selection[start:start+len(chunk)]]
+            start += len(chunk)
+        return
+    for start in range(0, max(len(df), 1), chunksize):
+        stop = start + chunksize
+        yield df.iloc[start:stop][selection[start:stop]]
+
+def get_tables(df, selection, chunksize):
+    '''
+    Yields the cut dataframe one chunk at a time as Arrow tables, which all
+    share the schema of the first non-empty chunk. Empty chunks before it are
+    skipped, as the types of their object columns cannot be told. If every
+    chunk is empty, a single empty table is returned.
+
+    Parameters:
+        df (pandas.core.frame.DataFrame): The full dataframe, or a catalogue
+            from catalogue_functions.
+        selection (ndarray): A boolean array, True for every row to keep.
+        chunksize (int): The number of rows of 'df' in each chunk.
+    '''
+    import pyarrow as pa
+
+    schema, chunk = None, None
+    for chunk in get_chunks(df, selection, chunksize):
+        if schema is None and len(chunk) == 0:
+            continue
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=True)
+        schema = table.schema
+        yield table
+    if schema is None:
+        yield pa.Table.from_pandas(chunk, preserve_index=True)
+
+def get_widths(df, selection, chunksize):
+    '''
+    Finds the widest value of every string column of the cut dataframe, in a
+    first pass over its chunks, so that fixed-width formats can be sized
+    before anything is written.
+
+    Parameters:
+        df (pandas.core.frame.DataFrame): The full dataframe, or a catalogue
+            from catalogue_functions.
+        selection (ndarray): A boolean array, True for every row to keep.
+        chunksize (int): The number of rows of 'df' in each chunk.
+
+    Returns:
+        dict: The widest value of every object or string column in bytes of
+            UTF-8, which is never fewer than its number of characters.
+    '''
+    widths = None
+    for chunk in get_chunks(df, selection, chunksize):
+        if widths is None:
+            widths = {column: 1 for column in chunk if pd.api.types.is_object_dtype(chunk[column].dtype)\
+                      or pd.api.types.is_string_dtype(chunk[column].dtype)}
+            if len(widths) == 0:
+                break
+        if len(chunk) > 0:
+            for column in widths:
+                width = chunk[column].astype(str).str.encode('utf-8').str.len().max()
+                widths[column] = max(widths[column], int(width))
+    return widths or {}
+
+def save_csv(df, selection, floc, chunksize):
+    with open(floc, 'w') as f:
+        for idx, chunk in enumerate(get_chunks(df, selection, chunksize)):
+            chunk.to_csv(f, header=(idx == 0), sep=' ')
+
+def save_parquet(df, selection, floc, chunksize):
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print('Saving to Parquet requires pyarrow. Please install it or choose another format.')
+        return None
+
+    writer = None
+    for table in get_tables(df, selection, chunksize):
+        if writer is None:
+            writer = pq.ParquetWriter(floc, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+def save_feather(df, selection, floc, chunksize):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        print('Saving to Feather requires pyarrow. Please install it or choose another format.')
+        return None
+
+    writer = None
+    for table in get_tables(df, selection, chunksize):
+        if writer is None:
+            writer = pa.ipc.new_file(floc, table.schema)
+        writer.write_table(table)
+    writer.close()
+
+def save_hdf(df, selection, floc, chunksize):
+    try:
+        store = pd.HDFStore(floc, mode='w')
+    except ImportError:
+        print('Saving to HDF5 requires PyTables. Please install it or choose another format.')
+        return None
+
+    #String columns are sized by the first chunk written, so must be given their widest
+    widths = get_widths(df, selection, chunksize)
+    with store:
+        for chunk in get_chunks(df, selection, chunksize):
+            store.append('data', chunk, format='table', min_itemsize=widths or None)
+
+def save_npy(df, selection, floc, chunksize):
+    #String columns are written as fixed-width unicode, wide enough for every row
+    dtypes = {column: 'U'+str(width) for column, width in get_widths(df, selection, chunksize).items()}
+
+    out = None
+    start = 0
+    for chunk in get_chunks(df, selection, chunksize):
+        records = chunk.to_records(index=False)
+        if len(dtypes) > 0:
+            records = records.astype([(name, dtypes.get(name, records.dtype[name]))\
+                                      for name in records.dtype.names])
+        if out is None:
+            if records.dtype.hasobject:
+                print('Columns of type '+', '.join(str(chunk[name].dtype) for name in records.dtype.names\
+                      if records.dtype[name].hasobject)+' cannot be saved to .npy. Please choose another format.')
+                return None
+            out = np.lib.format.open_memmap(floc, mode='w+', dtype=records.dtype,\
+                                    shape=(int(np.count_nonzero(selection)),))
+        out[start:start+len(chunk)] = records
+        start += len(chunk)
+    out.flush()
+    del out
+
+def save_selection(selection, sloc):
+    '''
+    Writes out which rows survive the cuts, instead of the data itself. The
+    selection is stored in a compressed .npz file either as a bitmap of one bit
+    per row, or as an array of int32/int64 row positions, whichever is smaller.
+
+    Parameters:
+        selection (ndarray): A boolean array, True for every row to keep.
+        sloc (str): The output location.
+    '''
+    nrows = len(selection)
+    rows = np.flatnonzero(selection)
+    if nrows < 2**31:
+        rows = rows.astype(np.int32)
+    if rows.nbytes < (nrows + 7) // 8:
+        np.savez_compressed(sloc, nrows=nrows, rows=rows)
+    else:
+        np.savez_compressed(sloc, nrows=nrows, bits=np.packbits(selection))
+
+def get_selection(sloc):
+    '''
+    Reads in a selection file written by save_selection().
+
+    Parameters:
+        sloc (str): The location of the selection file.
+
+    Returns:
+        ndarray: A boolean array, True for every row that survived the cuts.
+    '''
+    with np.load(sloc) as f:
+        nrows = int(f['nrows'])
+        if 'bits' in f:
+            return np.unpackbits(f['bits'], count=nrows).astype(bool)
+        selection = np.zeros(nrows, dtype=bool)
+        selection[f['rows']] = True
+        return selection
+
+def apply_selection(df, sloc):
+    '''
+    Applies a selection file written by barbershop to a dataframe, without
+    re-evaluating the cuts.
+
+    Parameters:
+        df (pandas.core.frame.DataFrame): The dataframe the selection was made
+            from, with its rows in the same order.
+        sloc (str): The location of the selection file.
+
+    Returns:
+        pandas.core.frame.DataFrame: The rows of 'df' that survived the cuts.
+    '''
+    try:
+        selection = get_selection(sloc)
+    except IOError:
+        print('This file does not exist. Please fill in a correct file path.')
+        return None
+    if len(selection) != len(df):
+        print('The selection was made from a dataframe with '+str(len(selection))+' rows, not '+str(len(df))+'.')
+        return None
+    return df[selection]
+
+def get_schema(df, clients):
+    '''
+    Returns a hash of the names and dtypes of the given columns of a
+    dataframe, used to check that a cut file is applied to matching data.
+
+    Parameters:
+        df (pandas.core.frame.DataFrame): The dataframe.
+        clients (list): The names of the columns to include.
+
+    Returns:
+        str: A hexadecimal SHA-1 hash.
+    '''
+    schema = [[client, str(df[client].dtype)] for client in clients]
+    return hashlib.sha1(json.dumps(schema).encode('utf-8')).hexdigest()
+
+def save_cuts(lower, upper, cloc, df, polygon=None):
+    '''
+    Writes out the cuts made in every client. If 'cloc' ends in '.json', a
+    versioned file is written that also holds the column dtypes and a hash of
+    the data schema. Otherwise a space separated .csv with 'lower' and 'upper'
+    rows is written, as in barbershop 1.0, and any polygon cut is written
+    next to it in a .json file (see get_polygonloc()).
+
+    Parameters:
+        lower (pandas.core.frame.DataFrame): The lower boundary of the cut in
+            each parameter space.
+        upper (pandas.core.frame.DataFrame): The upper boundary of the cut in
+            each parameter space.
+        cloc (str): The output location.
+        df (pandas.core.frame.DataFrame): The dataframe the cuts were made on.
+        polygon (dict): Default None. The polygon cut, as the names of its 'x'
+            and 'y' columns and its 'vertices'.
+    '''
+    clients = list(lower)
+    if os.path.splitext(cloc)[1].lower() != '.json':
+        cut = pd.concat([lower, upper])
+        cut.index = ['lower','upper']
+        cut.to_csv(cloc,header=True,sep=' ')
+        #A polygon left over from earlier cuts saved here must not be read back in
+        ploc = get_polygonloc(cloc)
+        if polygon is not None:
+            with open(ploc, 'w') as f:
+                json.dump({'format': 'barbershop-polygon', 'version': 1,\
+                           'polygon': get_polygondict(polygon)}, f, indent=1)
+        elif os.path.exists(ploc):
+            os.remove(ploc)
+        return None
+
+    cuts = {'format': 'barbershop-cuts',
+            'version': 1 if polygon is None else 2,
+            'clients': clients,
+            'lower': [float(lower[client][0]) for client in clients],
+            'upper': [float(upper[client][0]) for client in clients],
+            'dtypes': [str(df[client].dtype) for client in clients],
+            'schema': get_schema(df, clients)}
+    if polygon is not None:
+        cuts['polygon'] = get_polygondict(polygon)
+    with open(cloc, 'w') as f:
+        json.dump(cuts, f, indent=1)
+
+def get_cuts(cloc):
+    '''
+    Reads in a file of cuts written by save_cuts(), in either format.
+
+    Parameters:
+        cloc (str): The location of the file of cuts.
+
+    Returns:
+        pandas.core.frame.DataFrame: The lower boundary of every client.
+        pandas.core.frame.DataFrame: The upper boundary of every client.
+        str: The hash of the data schema, or None for .csv files.
+    '''
+    if os.path.splitext(cloc)[1].lower() != '.json':
+        reg = pd.read_csv(cloc, sep=' ', index_col=0)
+        return reg.loc[['lower']].reset_index(drop=True),\
+               reg.loc[['upper']].reset_index(drop=True), None
+
+    with open(cloc) as f:
+        cuts = json.load(f)
+    if cuts['format'] != 'barbershop-cuts' or cuts['version'] > CUTS_VERSION:
+        raise KeyError('format')
+    clients = cuts['clients']
+    return pd.DataFrame([cuts['lower']], columns=clients),\
+           pd.DataFrame([cuts['upper']], columns=clients), cuts['schema']
+
+def get_polygon(cloc):
+    '''
+    Reads in the polygon cut from a file of cuts written by save_cuts().
+
+    Parameters:
+        cloc (str): The location of the file of cuts.
+
+    Returns:
+        dict: The names of the 'x' and 'y' columns of the polygon and its
+            'vertices' as an ndarray, or None if there is no polygon cut.
+    '''
+    if os.path.splitext(cloc)[1].lower() != '.json':
+        cloc = get_polygonloc(cloc)
+        if not os.path.exists(cloc):
+            return None
+    with open(cloc) as f:
+        cuts = json.load(f)
+    if 'polygon' not in cuts:
+        return None
+    polygon = cuts['polygon']
+    return {'x': polygon['x'], 'y': polygon['y'],\
+            'vertices': np.array(polygon['vertices'], dtype=float).reshape(-1, 2)}
+
+def get_polygonloc(cloc):
+    '''
+    Returns the location of the .json file holding the polygon cut saved
+    alongside a .csv file of cuts, e.g. 'cuts_polygon.json' for 'cuts.csv'.
+    '''
+    return os.path.splitext(cloc)[0]+'_polygon.json'
+
+def get_polygondict(polygon):
+    '''
+    Returns the polygon cut in the form written to .json files.
+    '''
+    return {'x': polygon['x'], 'y': polygon['y'],\
+            'vertices': np.asarray(polygon['vertices'], dtype=float).tolist()}
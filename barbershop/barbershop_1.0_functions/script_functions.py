@@ -0,0 +1,41 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Lets the modules of barbershop that double as console commands, such as
+batch_functions and benchmark_functions, be run by their location. This
+directory is not an importable package name, so the package is loaded from it
+under the name 'barbershop' before their relative imports are made, e.g.:
+
+    if not __package__:
+        from script_functions import load_package
+        __package__ = load_package()
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import os
+import sys
+import importlib.util
+
+def load_package(name='barbershop'):
+    '''
+    Imports the package held in this directory under 'name', if not already
+    imported.
+
+    Parameters:
+        name (str): Default 'barbershop'. The name to import the package as.
+
+    Returns:
+        str: The name of the package, to be set as the __package__ of the
+            script so that its relative imports resolve.
+    '''
+    if name not in sys.modules:
+        floc = os.path.dirname(os.path.abspath(__file__))
+        spec = importlib.util.spec_from_file_location(name, os.path.join(floc, '__init__.py'),\
+                                                      submodule_search_locations=[floc])
+        sys.modules[name] = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(sys.modules[name])
+    return name
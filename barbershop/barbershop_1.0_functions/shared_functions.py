@@ -0,0 +1,240 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A catalogue held in OS shared memory, that stands in for the pandas DataFrame
+fed into __init__.open(). The columns are published once, and any number of
+barbershops, in this or other processes on the same machine, attach to them
+read-only. Each barbershop then only holds its own masks. Sorted indices of
+the clients can be published alongside the columns, so that they are not
+rebuilt by every barbershop either.
+
+Catalogues saved as a directory of .npy columns are memory-mapped by
+catalogue_functions.catalogueclass, and so are already shared between
+processes through the page cache.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import os
+import sys
+import json
+from multiprocessing import shared_memory
+import numpy as np
+import pandas as pd
+
+from .mask_functions import get_sorted
+
+#Every array in the shared memory starts on a multiple of this many bytes
+ALIGN = 64
+#The names of the catalogues published, and so owned, by this process
+PUBLISHED = set()
+
+class sharedclass:
+    def __init__(self, _name, _shm=None):
+        '''
+        A class that attaches to a catalogue published into shared memory by
+        publish(), and reads its columns without copying them.
+
+        Parameters:
+            _name (str): The name the catalogue was published under.
+            _shm (multiprocessing.shared_memory.SharedMemory): Default None.
+                The shared memory, if already open. Used by publish().
+        '''
+        self.name = _name
+        self.owner = _shm is not None
+        self.shm = _shm if _shm is not None else get_memory(_name)
+        self.cache = {}
+
+        hoff, hlen = np.frombuffer(self.shm.buf, dtype=np.uint64, count=2).tolist()
+        header = json.loads(bytes(self.shm.buf[hoff:hoff+hlen]).decode('utf-8'))
+        self.length = header['nrows']
+        self.arrays = {}
+        for kind, name, dtype, offset, length in header['arrays']:
+            values = np.ndarray((length,), dtype=np.dtype(dtype), buffer=self.shm.buf, offset=offset)
+            values.flags.writeable = False
+            self.arrays[(kind, name)] = values
+        self.columns = [name for kind, name in self.arrays if kind == 'column']
+
+    def __len__(self):
+        return self.length
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    @property
+    def index(self):
+        if ('index', None) in self.arrays:
+            return pd.Index(self.arrays[('index', None)])
+        return pd.RangeIndex(self.length)
+
+    def __getitem__(self, name):
+        '''
+        Returns a single column, as a read-only view of the shared memory.
+
+        Parameters:
+            name (str): The name of the column.
+
+        Returns:
+            pandas.core.series.Series: The column.
+        '''
+        if name not in self.columns:
+            raise KeyError(name)
+        if name not in self.cache:
+            self.cache[name] = pd.Series(self.arrays[('column', name)], name=name, copy=False)
+        return self.cache[name]
+
+    def get_index(self, name):
+        '''
+        Returns the sorted index of a column, if one was published.
+
+        Parameters:
+            name (str): The name of the column.
+
+        Returns:
+            tuple: The row order that sorts the non-NaN values of the column,
+                and the sorted values themselves, or None.
+        '''
+        if ('order', name) not in self.arrays:
+            return None
+        return self.arrays[('order', name)], self.arrays[('sorted', name)]
+
+    def get_chunks(self, chunksize):
+        '''
+        Yields every column of the catalogue, one chunk of rows at a time.
+
+        Parameters:
+            chunksize (int): The largest number of rows in each chunk.
+        '''
+        index = self.index
+        for start in range(0, max(self.length, 1), chunksize):
+            stop = min(start + chunksize, self.length)
+            yield pd.DataFrame({name: self.arrays[('column', name)][start:stop]\
+                                for name in self.columns}, index=index[start:stop])
+
+    def close(self):
+        '''
+        Detaches from the shared memory. The columns can no longer be used,
+        so any barbershop using them must be closed first.
+        '''
+        self.cache = {}
+        self.arrays = {}
+        self.shm.close()
+
+    def unlink(self):
+        '''
+        Frees the shared memory once every process has detached from it. Only
+        the catalogue returned by publish() may do this.
+        '''
+        if not self.owner:
+            print('Only the catalogue returned by publish() can free the shared memory.')
+            return None
+        self.close()
+        self.shm.unlink()
+        PUBLISHED.discard(self.name)
+
+def get_memory(name):
+    '''
+    Attaches to an existing block of shared memory, without taking ownership
+    of it, so that it is not freed when this process exits.
+    '''
+    if sys.version_info >= (3, 13):
+        return shared_memory.SharedMemory(name=name, track=False)
+    shm = shared_memory.SharedMemory(name=name)
+    if os.name == 'posix' and name not in PUBLISHED:
+        from multiprocessing import resource_tracker
+        resource_tracker.unregister(shm._name, 'shared_memory')
+    return shm
+
+def publish(df, name, columns=None, sort=None):
+    '''
+    Copies the columns of a dataframe into shared memory, where barbershops in
+    any process can attach to them with sharedclass(name), e.g.:
+
+        shared = barbershop.publish(df, 'kepler', sort=['Teff', 'logg'])
+        barber = barbershop.open(barbershop.sharedclass('kepler'), 'ra', 'dec')
+
+    The shared memory lasts until unlink() is called on the catalogue returned.
+
+    Parameters:
+        df (pandas.core.frame.DataFrame): The dataframe, or a catalogueclass.
+        name (str): The name to publish the catalogue under.
+        columns (list): Default None. The columns to publish. If None, all
+            numeric columns are published.
+        sort (list): Default None. Columns whose sorted index is built once
+            here and published too, for the clients cut in.
+
+    Returns:
+        sharedclass: The published catalogue, which owns the shared memory.
+    '''
+    #Find the shape of every array first, reading one column at a time
+    plan, sorts, left = [], [], []
+    for column in (list(df) if columns is None else columns):
+        values = get_column(df, column)
+        if columns is None and values.dtype.kind not in 'biufcmM':
+            left.append(str(column))
+            continue
+        plan.append(('column', column, values.dtype, len(values)))
+        if column in (sort or []):
+            #NaNs can never pass a cut, and are left out of the sorted index
+            nvalid = len(values) - int(np.count_nonzero(np.isnan(values)) if values.dtype.kind == 'f' else 0)
+            sorts += [('order', column, np.dtype(np.intp), nvalid), ('sorted', column, values.dtype, nvalid)]
+        del values
+    if len(left) > 0:
+        print('Only numeric columns can be shared. Leaving out: '+', '.join(left)+'.')
+    missing = set(sort or []) - set(column for kind, column, dtype, length in plan)
+    if len(missing) > 0:
+        print('Sorted columns must also be published: '+', '.join(sorted(map(str, missing)))+'.')
+        return None
+
+    index = df.index
+    if not (isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1):
+        if index.dtype.kind not in 'biufmM':
+            print('Only dataframes with a numeric index can be shared.')
+            return None
+        plan.append(('index', None, index.dtype, len(index)))
+    plan += sorts
+
+    #The header offset and length come first, then the arrays, then the header
+    entries, offset = [], ALIGN
+    for kind, column, dtype, length in plan:
+        entries.append([kind, column, dtype.str, offset, length])
+        offset += -(-length*dtype.itemsize // ALIGN) * ALIGN
+    header = json.dumps({'nrows': len(index), 'arrays': entries}).encode('utf-8')
+
+    shm = shared_memory.SharedMemory(name=name, create=True, size=offset+len(header))
+    views = {(kind, column): np.ndarray((length,), dtype=np.dtype(dtype), buffer=shm.buf, offset=start)\
+             for kind, column, dtype, start, length in entries}
+    #Copy in, and sort, one column at a time, so only one is ever held in memory
+    for kind, column, dtype, length in plan:
+        if kind != 'column':
+            continue
+        values = get_column(df, column)
+        views[(kind, column)][:] = values
+        if column in (sort or []):
+            views[('order', column)][:], views[('sorted', column)][:] = get_sorted(values)
+        del values
+    if ('index', None) in views:
+        views[('index', None)][:] = index.to_numpy()
+    del views
+    shm.buf[offset:offset+len(header)] = header
+    np.ndarray((2,), dtype=np.uint64, buffer=shm.buf)[:] = [offset, len(header)]
+    PUBLISHED.add(name)
+    return sharedclass(name, shm)
+
+def get_column(df, column):
+    '''
+    Returns a column of a dataframe or catalogue as an array. Columns read in
+    from a catalogue for this are not kept in its cache.
+    '''
+    cache = getattr(df, 'cache', None)
+    cached = cache is not None and column in cache
+    values = df[column].to_numpy()
+    if cache is not None and not cached:
+        cache.pop(column, None)
+    return values
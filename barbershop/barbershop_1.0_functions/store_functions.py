@@ -0,0 +1,120 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+The columnar store used by __init__.open() to hold X, Y and the client data as
+contiguous NumPy arrays, in place of a pandas DataFrame.
+
+Summary statistics of every column are computed once and kept alongside it.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import numpy as np
+import pandas as pd
+
+#The quantiles kept in the statistics of every column
+QUANTILES = np.array([0.05, 0.25, 0.5, 0.75, 0.95])
+
+class storeclass:
+    def __init__(self, _index, _dtype=None):
+        '''
+        A class that holds a set of equal length columns as contiguous NumPy
+        arrays. Columns whose dtype already matches are taken as views of the
+        original data, so no copy is made.
+
+        Parameters:
+            _index (pandas.core.indexes.base.Index): The index of the dataframe
+                the columns are taken from, used to label the cut data.
+            _dtype (numpy.dtype): Default None. If given, every column is cast
+                to this dtype (e.g. np.float32 to halve the memory use).
+                Otherwise columns keep their own dtype.
+        '''
+        self.index = _index
+        self.dtype = _dtype
+        self.columns = {}
+        self.stats = {}
+
+    def __len__(self):
+        return len(self.index)
+
+    def __iter__(self):
+        return iter(list(self.columns))
+
+    def __contains__(self, name):
+        return name in self.columns
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def __setitem__(self, name, values):
+        if isinstance(values, pd.Series):
+            values = values.to_numpy(dtype=self.dtype, copy=False)
+        elif self.dtype is not None:
+            values = np.asarray(values, dtype=self.dtype)
+        #Only copies if the data is not already contiguous
+        self.columns[name] = np.ascontiguousarray(values)
+        self.stats.pop(name, None)
+
+    def __delitem__(self, name):
+        del self.columns[name]
+        self.stats.pop(name, None)
+
+    def describe(self, name, svalues=None):
+        '''
+        Returns the statistics of a column, computing them the first time it
+        is asked for.
+
+        Parameters:
+            name (str): The name of the column.
+            svalues (ndarray): Default None. The sorted non-NaN values of the
+                column, if already known, from which the statistics are read
+                off without another pass over the data.
+
+        Returns:
+            dict: The 'min', 'max', number of 'nans' and 'quantiles' (at
+                QUANTILES) of the column.
+        '''
+        if name not in self.stats:
+            values = self.columns[name]
+            presorted = svalues is not None
+            if not presorted:
+                svalues = values[~np.isnan(values)]
+            if len(svalues) == 0:
+                stats = {'min': np.nan, 'max': np.nan,\
+                         'quantiles': np.full(len(QUANTILES), np.nan)}
+            elif presorted:
+                #Interpolate the quantiles between neighbouring sorted values
+                pos = QUANTILES*(len(svalues)-1)
+                lo = np.floor(pos).astype(int)
+                hi = np.minimum(lo+1, len(svalues)-1)
+                stats = {'min': svalues[0], 'max': svalues[-1],\
+                         'quantiles': svalues[lo] + (pos-lo)*(svalues[hi]-svalues[lo])}
+            else:
+                stats = {'min': np.min(svalues), 'max': np.max(svalues),\
+                         'quantiles': np.quantile(svalues, QUANTILES)}
+            stats['nans'] = len(values) - len(svalues)
+            self.stats[name] = stats
+        return self.stats[name]
+
+    def nbytes(self):
+        '''
+        Returns the memory used by all columns in the store, in bytes.
+        '''
+        return sum(values.nbytes for values in self.columns.values())
+
+    def take(self, rows):
+        '''
+        Returns a selection of rows of every column as a pandas DataFrame.
+
+        Parameters:
+            rows (ndarray): A boolean mask or an array of row positions.
+
+        Returns:
+            pandas.core.frame.DataFrame: The selected rows, labelled with the
+                index of the original dataframe.
+        '''
+        return pd.DataFrame({name: values[rows] for name, values in self.columns.items()},\
+                            index=self.index[rows])
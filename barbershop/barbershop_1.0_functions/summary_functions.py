@@ -0,0 +1,216 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A binned summary of the data used by __init__.open() to estimate the number of
+rows surviving a set of cuts while the sliders are dragged, without touching
+the data. The data is binned once into a histogram cube over every client, X
+and Y, and the cube is summed cumulatively along each axis, so that the
+count in any box of bins is found from a handful of its entries. Axes that do
+not fit in the cube are binned on their own, and taken to be independent of
+the rest.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import numpy as np
+
+#The fewest bins along each axis of the cube
+MINBINS = 16
+#The number of bins of each axis summarised on its own
+LINEBINS = 1024
+
+class cubeclass:
+    def __init__(self, _barber, _maxcells=2**22):
+        '''
+        A class that bins the data of a barbershop into a cumulative histogram
+        cube over as many of the clients, X and Y as fit in '_maxcells' with at
+        least MINBINS bins each, in that order. The remaining axes are binned
+        on their own. Client bins hold roughly equal numbers of rows where a
+        sorted index of the client exists, and are of equal width otherwise.
+
+        Parameters:
+            _barber (barbershop.open): The barbershop class to summarise.
+            _maxcells (int): Default 2**22. The largest number of cells in the
+                cube, which sets the number of bins along every axis. Each cell
+                takes 8 bytes. Must be at least MINBINS+1.
+        '''
+        self.barber = _barber
+        seating = self.barber.seating
+        self.names = list(self.barber.lowers) + [self.barber.namex, self.barber.namey]
+        self.naxes = get_axes(len(self.names), _maxcells, MINBINS)
+        nbins = get_bins(self.naxes, _maxcells)
+
+        self.edges = []
+        for axis, name in enumerate(self.names):
+            count = nbins if axis < self.naxes else LINEBINS
+            svalues = self.barber.mask.sorted.get(name)
+            if svalues is not None and len(svalues) > 0:
+                edges = np.unique(svalues[np.linspace(0, len(svalues)-1, count+1).astype(int)])
+            else:
+                stats = seating.describe(name)
+                edges = np.unique(np.linspace(stats['min'], stats['max'], count+1))
+            if len(edges) < 2 or not np.all(np.isfinite(edges)):
+                edges = np.array([edges[0], edges[0]]) if np.isfinite(edges[0]) else np.zeros(2)
+            self.edges.append(edges.astype(float))
+
+        #Rows with a NaN client can never survive a cut, and are left out
+        keep = np.ones(len(seating), dtype=bool)
+        for name in self.barber.lowers:
+            keep &= ~np.isnan(seating[name])
+        bins, self.points, self.tops = [], [], []
+        for name, edges in zip(self.names, self.edges):
+            values = seating[name][keep]
+            idx = np.clip(np.searchsorted(edges, values, side='right')-1, 0, len(edges)-2)
+            #The share of each bin lying on its lower edge, as discrete values pile up there,
+            #and of the last bin lying on the top edge, which it also holds
+            counts = np.maximum(np.bincount(idx, minlength=len(edges)-1), 1)
+            self.points.append(np.bincount(idx[values == edges[idx]], minlength=len(edges)-1) / counts)
+            self.tops.append(np.count_nonzero(values == edges[-1]) / counts[-1] if edges[-1] > edges[-2] else 0.)
+            bins.append(idx)
+        shape = [len(edges)-1 for edges in self.edges[:self.naxes]]
+        cube = np.bincount(np.ravel_multi_index(bins[:self.naxes], shape), minlength=int(np.prod(shape)))
+
+        #Pad every axis with a leading zero, so entry [i, j, ...] counts the bins before it
+        self.prefix = np.zeros([size+1 for size in shape], dtype=np.int64)
+        self.prefix[tuple(slice(1, None) for size in shape)] = cube.reshape(shape)
+        for axis in range(len(shape)):
+            np.cumsum(self.prefix, axis=axis, out=self.prefix)
+        self.lines = [np.concatenate(([0], np.cumsum(np.bincount(idx, minlength=len(edges)-1))))\
+                      for idx, edges in zip(bins[self.naxes:], self.edges[self.naxes:])]
+        self.total = int(np.count_nonzero(keep))
+
+    def get_weights(self, axis, lower, upper):
+        '''
+        Returns the entries of the cumulative cube along one axis, and their
+        weights, that give the rows between two values, both included. The
+        rows of a bin are taken to be partly on its lower edge, and otherwise
+        spread evenly across it, so that values part way through a bin take a
+        share of its rows in proportion.
+
+        Parameters:
+            axis (int): The axis of the cube.
+            lower (float): The lower boundary of the cut.
+            upper (float): The upper boundary of the cut.
+
+        Returns:
+            ndarray: The entries along the axis.
+            ndarray: The weight of each entry.
+        '''
+        edges = self.edges[axis]
+        weights = np.zeros(len(edges))
+        for value, sign in [(upper, 1.), (lower, -1.)]:
+            if value > edges[-1]:
+                weights[-1] += sign
+                continue
+            #Rows on the lower bound are kept, so only those below it are taken away
+            if value < edges[0] or (sign < 0 and value == edges[0]):
+                continue
+            idx = min(np.searchsorted(edges, value, side='right')-1, len(edges)-2)
+            width = edges[idx+1] - edges[idx]
+            frac = (value - edges[idx]) / width if width > 0 else 0.
+            if sign < 0 and value == edges[-1]:
+                frac = 1. - self.tops[axis]
+            elif sign > 0 or value > edges[idx]:
+                point = self.points[axis][idx]
+                frac = point + (1.-point)*frac
+            weights[idx] += sign*(1.-frac)
+            weights[idx+1] += sign*frac
+        entries = np.flatnonzero(weights)
+        return entries, weights[entries]
+
+    def get_counts(self, lower, upper, keep=None):
+        '''
+        Contracts the cumulative cube down to the rows within a set of cuts.
+        Cuts in axes outside the cube scale the result by the share of rows
+        they keep on their own.
+
+        Parameters:
+            lower (dict): The lower boundary of the cut in each client.
+            upper (dict): The upper boundary of the cut in each client.
+            keep (int): Default None. An axis left uncontracted.
+
+        Returns:
+            float or ndarray: The estimated number of rows, or the estimated
+                cumulative number of rows along the axis 'keep'.
+        '''
+        selectors = []
+        for axis, name in enumerate(self.names[:self.naxes]):
+            if axis == keep:
+                selectors.append((np.arange(len(self.edges[axis])), None))
+            elif name in lower:
+                selectors.append(self.get_weights(axis, lower[name][0], upper[name][0]))
+            else:
+                selectors.append((np.array([len(self.edges[axis])-1]), np.ones(1)))
+        counts = self.prefix[np.ix_(*[entries for entries, weights in selectors])].astype(float)
+        if keep is not None and keep < self.naxes:
+            counts = np.moveaxis(counts, keep, -1)
+            selectors.pop(keep)
+        for entries, weights in selectors:
+            counts = np.tensordot(weights, counts, axes=(0, 0))
+
+        for axis, name in enumerate(self.names[self.naxes:], self.naxes):
+            line = self.lines[axis-self.naxes]
+            if axis == keep:
+                counts = counts * line / max(self.total, 1)
+            elif name in lower:
+                entries, weights = self.get_weights(axis, lower[name][0], upper[name][0])
+                counts = counts * np.dot(weights, line[entries]) / max(self.total, 1)
+        return counts
+
+    def count(self, lower, upper):
+        '''
+        Estimates the number of rows surviving a set of cuts.
+
+        Parameters:
+            lower (dict): The lower boundary of the cut in each client.
+            upper (dict): The upper boundary of the cut in each client.
+
+        Returns:
+            int: The estimated number of surviving rows.
+        '''
+        return int(round(float(self.get_counts(lower, upper))))
+
+    def marginal(self, name, lower, upper):
+        '''
+        Estimates the histogram of X, Y or a client among the rows surviving a
+        set of cuts, on the bins of the cube.
+
+        Parameters:
+            name (str): The name of X, Y or a client.
+            lower (dict): The lower boundary of the cut in each client.
+            upper (dict): The upper boundary of the cut in each client.
+
+        Returns:
+            ndarray: The estimated number of surviving rows in each bin.
+            ndarray: The edges of the bins.
+        '''
+        axis = self.names.index(name)
+        return np.diff(self.get_counts(lower, upper, keep=axis)), self.edges[axis]
+
+def get_axes(naxes, maxcells, minbins):
+    '''
+    Returns the most axes, up to 'naxes', that a cumulative cube of at most
+    'maxcells' cells can hold with 'minbins' bins along each.
+    '''
+    count = 0
+    while count < naxes and (minbins+1)**(count+1) <= maxcells:
+        count += 1
+    return count
+
+def get_bins(naxes, maxcells):
+    '''
+    Returns the most bins along each of 'naxes' axes that keep a cumulative
+    cube, with one more entry than bins along each axis, within 'maxcells'.
+    '''
+    if naxes == 0:
+        return 0
+    nbins = max(int(maxcells ** (1./naxes)) - 1, 1)
+    #Step off any rounding in the root
+    while (nbins+2)**naxes <= maxcells:
+        nbins += 1
+    while nbins > 1 and (nbins+1)**naxes > maxcells:
+        nbins -= 1
+    return nbins
@@ -0,0 +1,126 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Optional instrumentation of the hot paths of barbershop. When turned on, the
+wall time of every stage of shave(), the slider updates, the histograms, the
+save and get_regular() is recorded, along with the rows going in and out and
+the bytes of the arrays produced. When turned off, each stage costs a single
+attribute check.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import time
+import threading
+from collections import deque
+from contextlib import nullcontext
+import numpy as np
+import pandas as pd
+
+#Shared by every stage while the instrumentation is off
+NULLSTAGE = nullcontext()
+
+class timingclass:
+    def __init__(self, _maxlen=1000):
+        '''
+        A class that records the wall time of named stages, grouped by the
+        function ('kind') they belong to.
+
+        Parameters:
+            _maxlen (int): Default 1000. The number of most recent timings kept
+                for every stage.
+        '''
+        self.enabled = False
+        self.maxlen = _maxlen
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        '''
+        Forgets all recorded timings.
+        '''
+        self.times = {}
+        self.counts = {}
+        self.last = {}
+
+    def stage(self, kind, name):
+        '''
+        Returns a context manager timing the code run inside it, e.g.:
+
+            with barber.timing.stage('shave', 'mask'):
+                ...
+
+        Parameters:
+            kind (str): The function the stage belongs to.
+            name (str): The name of the stage.
+        '''
+        if not self.enabled:
+            return NULLSTAGE
+        return stageclass(self, kind, name)
+
+    def record(self, kind, name, seconds):
+        with self.lock:
+            self.times.setdefault((kind, name), deque(maxlen=self.maxlen)).append(seconds)
+            self.last.setdefault(kind, {})[name] = seconds
+
+    def count(self, kind, rows_in, rows_out, nbytes):
+        '''
+        Records the number of rows going in and out of a function call, and
+        the bytes of the arrays it produced.
+        '''
+        with self.lock:
+            self.counts.setdefault(kind, deque(maxlen=self.maxlen)).append((rows_in, rows_out, nbytes))
+
+    def summary(self):
+        '''
+        Returns a summary of all recorded timings.
+
+        Returns:
+            pandas.core.frame.DataFrame: For every stage of every function,
+                the number of calls and the mean, median and maximum time in
+                milliseconds, along with the mean rows in and out and bytes
+                produced per call of the function.
+        '''
+        with self.lock:
+            rows = []
+            for (kind, name), times in self.times.items():
+                times = 1e3*np.array(times)
+                counts = np.array(self.counts.get(kind, [(np.nan,)*3]), dtype=float)
+                rows.append({'kind': kind, 'stage': name, 'calls': len(times),\
+                             'mean_ms': times.mean(), 'median_ms': np.median(times),\
+                             'max_ms': times.max(), 'rows_in': counts[:,0].mean(),\
+                             'rows_out': counts[:,1].mean(), 'bytes': counts[:,2].mean()})
+        return pd.DataFrame(rows, columns=['kind', 'stage', 'calls', 'mean_ms', 'median_ms',\
+                                           'max_ms', 'rows_in', 'rows_out', 'bytes'])
+
+    def breakdown(self, kinds):
+        '''
+        Returns a single line of text with the latest time of every stage of
+        the given functions, used for the on-screen overlay.
+
+        Parameters:
+            kinds (list): The functions to include, in order.
+        '''
+        with self.lock:
+            stages = [(name, seconds) for kind in kinds\
+                      for name, seconds in self.last.get(kind, {}).items()]
+        total = sum(seconds for name, seconds in stages)
+        return 'update %.1f ms: ' % (1e3*total) +\
+               ', '.join('%s %.1f' % (name, 1e3*seconds) for name, seconds in stages)
+
+class stageclass:
+    def __init__(self, _timing, _kind, _name):
+        self.timing = _timing
+        self.kind = _kind
+        self.name = _name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.timing.record(self.kind, self.name, time.perf_counter() - self.start)
+        return False
@@ -0,0 +1,101 @@
+#!/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+A background worker used by external_functions.haircutclass to compute cuts
+off the GUI thread. Only the latest request is ever computed, and results that
+have been overtaken by a newer request are thrown away.
+
+.. versioncreated:: 2.0
+
+.. codeauthor:: Oliver James Hall <ojh251@student.bham.ac.uk>
+"""
+
+import threading
+
+class workerclass:
+    def __init__(self, _compute):
+        '''
+        A class that runs a function on a single background thread. Requests
+        that arrive while the thread is busy replace any request still
+        waiting, and a request in progress can check stale() to stop early.
+
+        Parameters:
+            _compute (function): Called as _compute(generation, *args) on the
+                background thread. It should return None if it stopped early.
+        '''
+        self.compute = _compute
+        #Held while the cut engine is in use, by the worker or anyone else
+        self.lock = threading.Lock()
+        self.cond = threading.Condition()
+        self.generation = 0
+        self.job = None
+        self.tasks = []
+        self.result = None
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def submit(self, *args):
+        '''
+        Asks for the function to be run with new arguments, making any
+        earlier request stale.
+        '''
+        with self.cond:
+            self.generation += 1
+            self.job = (self.generation, args)
+            self.cond.notify()
+
+    def defer(self, task):
+        '''
+        Asks for a function to be called on the background thread once any
+        request already submitted has finished, so that it sees its result
+        without the caller waiting for it.
+        '''
+        with self.cond:
+            self.tasks.append(task)
+            self.cond.notify()
+
+    def stale(self, generation):
+        '''
+        Returns True if a newer request has been submitted since 'generation'.
+        '''
+        return generation != self.generation
+
+    def collect(self):
+        '''
+        Returns the latest finished result, or None if there is nothing new.
+        '''
+        with self.cond:
+            result, self.result = self.result, None
+        return result
+
+    def stop(self):
+        '''
+        Ends the background thread once it has finished its current request.
+        '''
+        with self.cond:
+            self.running = False
+            self.cond.notify()
+
+    def run(self):
+        while True:
+            with self.cond:
+                while self.job is None and len(self.tasks) == 0 and self.running:
+                    self.cond.wait()
+                if not self.running:
+                    return None
+                job, self.job = self.job, None
+                tasks, self.tasks = self.tasks, []
+
+            if job is not None:
+                generation, args = job
+                with self.lock:
+                    result = self.compute(generation, *args)
+                with self.cond:
+                    if result is not None and not self.stale(generation):
+                        self.result = result
+
+            with self.lock:
+                for task in tasks:
+                    task()